@@ -0,0 +1,110 @@
+"""
+Append-only journal of whipping state changes.
+
+Every mutation is one JSON line appended to the guild's journal. Config acts as the snapshot: once a
+flush has written the state up to a sequence number, compaction moves those records out of the
+live journal into a gzip archive that is kept for history.
+"""
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Compact the live journal once it grows past this many bytes
+COMPACT_BYTES = 1024 * 1024
+# Rotate the history archive once it grows past this many bytes, keeping one older archive
+ARCHIVE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class Journal:
+    """One guild's journal file, opened for appending"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.archive_path = path.with_name(path.stem + ".archive.jsonl.gz")
+        self.seq = 0
+        self._fp = None
+
+    def open(self, snapshot_seq: int) -> List[Dict[str, Any]]:
+        """Open the journal and return the records newer than the snapshot, for replay"""
+        self.seq = snapshot_seq
+        tail = []
+        needs_newline = False
+        if self.path.exists():
+            with open(self.path, "rb") as fp:
+                for line in fp:
+                    needs_newline = not line.endswith(b"\n")
+                    record = self._decode(line)
+                    if record is None:
+                        continue
+                    self.seq = max(self.seq, record["s"])
+                    if record["s"] > snapshot_seq:
+                        tail.append(record)
+
+        self._fp = open(self.path, "a", encoding="utf-8")
+        if needs_newline:
+            # A crash cut the last record short; keep the next one on its own line
+            self._fp.write("\n")
+            self._fp.flush()
+        return tail
+
+    def close(self):
+        if self._fp:
+            self._fp.close()
+            self._fp = None
+
+    def append(self, op: str, **fields: Any) -> Dict[str, Any]:
+        """Write one record with a single small write and return it"""
+        self.seq += 1
+        record = {"s": self.seq, "t": int(time.time()), "op": op, **fields}
+        self._fp.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._fp.flush()
+        return record
+
+    def compact(self, snapshot_seq: int, force: bool = False):
+        """Archive the records covered by the snapshot and keep only the newer ones live"""
+        if self._fp is None or (not force and self._fp.tell() < COMPACT_BYTES):
+            return
+
+        self._fp.close()
+        live = []
+        with open(self.path, "rb") as fp, gzip.open(self.archive_path, "ab") as archive:
+            for line in fp:
+                record = self._decode(line)
+                if record is None:
+                    continue
+                if record["s"] > snapshot_seq:
+                    live.append(line)
+                else:
+                    archive.write(line)
+
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as fp:
+            fp.writelines(live)
+        os.replace(tmp_path, self.path)
+        self._fp = open(self.path, "a", encoding="utf-8")
+
+        if self.archive_path.stat().st_size > ARCHIVE_MAX_BYTES:
+            os.replace(self.archive_path, self.archive_path.with_name(self.archive_path.name + ".1"))
+
+    def history(self) -> Iterator[Dict[str, Any]]:
+        """Every record still on disk, oldest first"""
+        older_archive = self.archive_path.with_name(self.archive_path.name + ".1")
+        for path in (older_archive, self.archive_path):
+            if path.exists():
+                with gzip.open(path, "rb") as fp:
+                    yield from filter(None, map(self._decode, fp))
+        if self.path.exists():
+            with open(self.path, "rb") as fp:
+                yield from filter(None, map(self._decode, fp))
+
+    @staticmethod
+    def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+        """Parse one journal line, ignoring blank or truncated ones"""
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) and "s" in record else None
@@ -0,0 +1,158 @@
+"""
+Per-member 24x7 presence histograms used to order whipmode lists.
+
+Every member gets one fixed-size row of 168 hour-of-week buckets (Monday 00:00 UTC first), so
+storage stays constant per member no matter how long the bot has been watching.
+"""
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+HOURS_PER_WEEK = 24 * 7
+BUCKET_MAX = np.iinfo(np.uint8).max
+
+
+def hour_of_week(when: Optional[datetime] = None) -> int:
+    """Histogram bucket for a UTC datetime, defaulting to now"""
+    when = when or datetime.utcnow()
+    return when.weekday() * 24 + when.hour
+
+
+class PresenceHistograms:
+    """One uint8 row of hour-of-week counts per member, grown in blocks as members are seen"""
+
+    def __init__(self, user_ids: Optional[np.ndarray] = None, counts: Optional[np.ndarray] = None,
+                 samples: Optional[np.ndarray] = None):
+        user_ids = user_ids if user_ids is not None else np.zeros(0, dtype=np.int64)
+        counts = counts if counts is not None else np.zeros((0, HOURS_PER_WEEK), dtype=np.uint8)
+        samples = samples if samples is not None else np.zeros(HOURS_PER_WEEK, dtype=np.uint32)
+
+        self.rows: Dict[int, int] = {int(user_id): row for row, user_id in enumerate(user_ids)}
+        self.counts = counts.astype(np.uint8, copy=True)
+        # How many hours each bucket was sampled, the denominator for online probabilities
+        self.samples = samples.astype(np.uint32, copy=True)
+        self.last_sample_hour = -1
+        # Last bucket recorded per row, so a burst of presence updates counts once per hour
+        self.last_bucket = np.full(len(self.counts), -1, dtype=np.int16)
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _row(self, user_id: int) -> int:
+        row = self.rows.get(user_id)
+        if row is not None:
+            return row
+
+        row = len(self.rows)
+        if row >= len(self.counts):
+            # Double the capacity so growth stays amortised O(1)
+            capacity = max(1024, 2 * len(self.counts))
+            counts = np.zeros((capacity, HOURS_PER_WEEK), dtype=np.uint8)
+            counts[:len(self.counts)] = self.counts
+            last_bucket = np.full(capacity, -1, dtype=np.int16)
+            last_bucket[:len(self.last_bucket)] = self.last_bucket
+            self.counts, self.last_bucket = counts, last_bucket
+        self.rows[user_id] = row
+        return row
+
+    def record(self, user_id: int, bucket: int):
+        """Count a member as active in an hour-of-week bucket"""
+        row = self._row(user_id)
+        if self.last_bucket[row] == bucket:
+            return
+        self.last_bucket[row] = bucket
+
+        # Halve a saturated row so old habits fade while the shape of the week is kept
+        if self.counts[row, bucket] == BUCKET_MAX:
+            self.counts[row] >>= 1
+        self.counts[row, bucket] += 1
+        self.dirty = True
+
+    def record_many(self, user_ids: Iterable[int], bucket: int):
+        """Count several members as active in a bucket at once, e.g. everyone online at a sample"""
+        rows = np.fromiter((self._row(user_id) for user_id in user_ids), dtype=np.int64)
+        rows = rows[self.last_bucket[rows] != bucket]
+        if not len(rows):
+            return
+        self.last_bucket[rows] = bucket
+
+        saturated = rows[self.counts[rows, bucket] == BUCKET_MAX]
+        self.counts[saturated] >>= 1
+        self.counts[rows, bucket] += 1
+        self.dirty = True
+
+    def sample(self, user_ids: Iterable[int], when: Optional[datetime] = None):
+        """Record everyone online at a periodic sample, counting each sampled hour once"""
+        when = when or datetime.utcnow()
+        bucket = hour_of_week(when)
+        hour = int(when.replace(tzinfo=timezone.utc).timestamp()) // 3600
+        if hour != self.last_sample_hour:
+            self.last_sample_hour = hour
+            self.samples[bucket] += 1
+            self.dirty = True
+        self.record_many(user_ids, bucket)
+
+    def scores(self, user_ids: Iterable[int], bucket: int) -> np.ndarray:
+        """
+        Estimated chance each member is active around `bucket`, relative to the rest of their week.
+
+        The current hour and half of each neighbouring hour are weighed against the member's total,
+        with one pseudo-count per bucket so members without history score the uniform prior.
+        """
+        rows = np.fromiter((self.rows.get(user_id, -1) for user_id in user_ids), dtype=np.int64)
+        known = rows >= 0
+        counts = np.zeros((len(rows), HOURS_PER_WEEK), dtype=np.float32)
+        counts[known] = self.counts[rows[known]]
+        counts += 1
+
+        window = (counts[:, bucket]
+                  + 0.5 * counts[:, (bucket - 1) % HOURS_PER_WEEK]
+                  + 0.5 * counts[:, (bucket + 1) % HOURS_PER_WEEK])
+        return window / counts.sum(axis=1)
+
+    def online_probabilities(self, user_ids: Iterable[int], bucket: int) -> Optional[np.ndarray]:
+        """
+        Estimated chance each member is online around `bucket`, or None if it was never sampled.
+
+        Uses the same window as scores(), divided by how often the window was sampled. One pseudo
+        sample at the average of these members keeps a short history from reading as 0% or 100%.
+        """
+        neighbours = [(bucket - 1) % HOURS_PER_WEEK, (bucket + 1) % HOURS_PER_WEEK]
+        sampled = float(self.samples[bucket]) + 0.5 * float(self.samples[neighbours].sum())
+        if not sampled:
+            return None
+
+        rows = np.fromiter((self.rows.get(user_id, -1) for user_id in user_ids), dtype=np.int64)
+        known = rows >= 0
+        seen = np.zeros(len(rows), dtype=np.float64)
+        counts = self.counts[rows[known]].astype(np.float64)
+        seen[known] = counts[:, bucket] + 0.5 * counts[:, neighbours].sum(axis=1)
+
+        prior = seen.mean() / sampled if len(seen) else 0.0
+        return np.minimum((seen + prior) / (sampled + 1), 1.0)
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Copies of the member IDs, their rows and the sample counts, safe to write from another thread"""
+        user_ids = np.fromiter(self.rows, dtype=np.int64, count=len(self.rows))
+        return user_ids, self.counts[:len(self.rows)].copy(), self.samples.copy()
+
+    @classmethod
+    def load(cls, path: Path) -> "PresenceHistograms":
+        if not path.exists():
+            return cls()
+        with np.load(path) as data:
+            # Snapshots from before sampled hours were counted have no samples array
+            samples = data["samples"] if "samples" in data.files else None
+            return cls(data["user_ids"], data["counts"], samples)
+
+
+def save_snapshot(path: Path, user_ids: np.ndarray, counts: np.ndarray, samples: np.ndarray):
+    """Atomically write a snapshot taken with PresenceHistograms.snapshot"""
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as fp:
+        np.savez_compressed(fp, user_ids=user_ids, counts=counts, samples=samples)
+    os.replace(tmp_path, path)
@@ -0,0 +1,98 @@
+"""
+Composable target queries over one UC member's users.
+
+A query walks an ordered source of user IDs and applies two kinds of filters: membership filters,
+which test IDs against the cog's indexes without touching the member cache, and member filters,
+which need the discord.Member. Nothing is evaluated until members() is called, membership filters
+run before any member lookup, and evaluation stops as soon as `limit` members have matched.
+"""
+from typing import Any, Callable, Container, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+# Filter names accepted by parse_filters; "name:value" for the ones that take an argument
+FILTER_NAMES = {
+    "online": False,  # Not offline
+    "liberator": False,  # Has the Liberator role
+    "updating": False,  # Has the Updating role
+    "recent": True,  # Joined in the last N days
+    "done": False,  # Marked done by any UC member this update
+    "zen": False,  # Not zen-messaged yet by the caller
+}
+
+
+def parse_filters(text: Optional[str]) -> List[Tuple[str, Optional[str], bool]]:
+    """
+    Split a filter string into (name, argument, negated) tuples.
+
+    Filters are separated by spaces and a leading "-" negates one, e.g. "online -done recent:30".
+    """
+    filters = []
+    for token in (text or "").split():
+        negated = token.startswith("-")
+        name, _, argument = token.lstrip("-").partition(":")
+        name = name.lower()
+        if name not in FILTER_NAMES:
+            raise ValueError(f"unknown filter `{name}`, use one of: {', '.join(FILTER_NAMES)}")
+        if FILTER_NAMES[name] != bool(argument):
+            usage = f"{name}:<value>" if FILTER_NAMES[name] else name
+            raise ValueError(f"filter `{name}` is written as `{usage}`")
+        filters.append((name, argument or None, negated))
+    return filters
+
+
+class StringKeys:
+    """Membership by user ID over a dict keyed by string IDs, the way Config stores them"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+
+    def __contains__(self, user_id: int) -> bool:
+        return str(user_id) in self.data
+
+
+class TargetQuery:
+    """Lazily filtered view of a source of user IDs"""
+
+    def __init__(self, guild: discord.Guild, source: Iterable[int]):
+        self.guild = guild
+        self.source = source
+        self.contains: List[Tuple[Container[int], bool]] = []  # (user IDs, keep members inside them)
+        self.predicates: List[Callable[[discord.Member], bool]] = []
+        self.missing: List[int] = []  # Source IDs that are no longer in the guild, from the last run
+
+    def include(self, user_ids: Container[int]) -> "TargetQuery":
+        """Keep only users in `user_ids`"""
+        self.contains.append((user_ids, True))
+        return self
+
+    def exclude(self, user_ids: Container[int]) -> "TargetQuery":
+        """Drop users in `user_ids`"""
+        self.contains.append((user_ids, False))
+        return self
+
+    def where(self, predicate: Callable[[discord.Member], bool]) -> "TargetQuery":
+        """Keep only members the predicate accepts"""
+        self.predicates.append(predicate)
+        return self
+
+    def __iter__(self):
+        self.missing = []
+        for user_id in self.source:
+            if not all((user_id in user_ids) == keep for user_ids, keep in self.contains):
+                continue
+            member = self.guild.get_member(user_id)
+            if member is None:
+                self.missing.append(user_id)
+                continue
+            if all(predicate(member) for predicate in self.predicates):
+                yield member
+
+    def members(self, limit: Optional[int] = None) -> List[discord.Member]:
+        """Evaluate the query, stopping after `limit` matches"""
+        members = []
+        for member in self:
+            members.append(member)
+            if limit and len(members) >= limit:
+                break
+        return members
@@ -0,0 +1,284 @@
+"""
+Monte-Carlo model of an update campaign, used to pick a stripe_count.
+
+This module only depends on numpy so it can also be run offline:
+    python simulation.py --members 100000 --uc 40 --target 0.8
+"""
+import argparse
+import math
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def stripe_layout(offsets: np.ndarray, counts: np.ndarray, uc_count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    UC slots, queue positions and valid-slot mask for members striped by `_stripe_users`.
+
+    Each member's stripe starts where the previous one ended, so with `offsets` the total stripe
+    count of the (shuffled) members before each one, the earlier stripes cover one unbroken run of
+    slots around the UC members. A member's position in UC member k's list is how often that run
+    passes k. Rows are padded to the widest stripe; padding slots are marked invalid.
+    """
+    width = int(counts.max())
+    slots = (offsets[:, None] + np.arange(width)[None, :]) % uc_count
+    positions = (offsets[:, None] - slots + uc_count - 1) // uc_count
+    valid = np.arange(width)[None, :] < counts[:, None]
+    return slots, positions, valid
+
+
+def presence_order(online_probabilities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per member, the online probability of everyone whipmode lists before them, divided by the member count.
+
+    Whipmode puts likelier members first, so the first array sums the probabilities above each
+    member's. Ties keep assignment order, so the second is the tied members' share times the member's
+    own probability, to be scaled by their queue position.
+    """
+    values, inverse, counts = np.unique(online_probabilities, return_inverse=True, return_counts=True)
+    weight = values * counts
+    above = (weight.sum() - np.cumsum(weight))[inverse]
+    return above / len(online_probabilities), weight[inverse] / len(online_probabilities)
+
+
+def queue_layout(queues: Sequence[np.ndarray], established: Sequence[np.ndarray], online_probabilities: np.ndarray,
+                 members: np.ndarray, new_dm_penalty: float
+                 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    UC slots, expected work ahead, own DM cost and valid-slot mask of `members` in real queues.
+
+    `queues[k]` lists member indices in the order UC member k walks them and `established[k]` whether
+    each of those pairs already has a zen DM. The work ahead of a pair is the expected DM cost of the
+    members before it in its queue who are online.
+    """
+    costs = [np.where(marks, 1.0, new_dm_penalty) for marks in established]
+    uc_slots = np.concatenate([np.full(len(queue), k, dtype=np.int64) for k, queue in enumerate(queues)])
+    member_ids = np.concatenate(queues)
+    pair_costs = np.concatenate(costs)
+    work = [online_probabilities[queue] * cost for queue, cost in zip(queues, costs)]
+    work_ahead = np.concatenate([np.cumsum(w) - w for w in work])
+
+    # Group pairs by member, then pad each sampled member's pairs to the widest row
+    order = np.argsort(member_ids, kind="stable")
+    pair_counts = np.bincount(member_ids, minlength=len(online_probabilities))[members]
+    starts = np.searchsorted(member_ids[order], members)
+    width = max(int(pair_counts.max()), 1)
+    columns = np.arange(width)[None, :]
+    valid = columns < pair_counts[:, None]
+    index = order[np.minimum(starts[:, None] + columns, len(order) - 1)]
+    return uc_slots[index], work_ahead[index], pair_costs[index], valid
+
+
+class SimulationResult(NamedTuple):
+    stripe_count: int  # Stripe count of members without a stripe tier, 0 for the current assignments
+    zen_dms_per_uc: float  # Zen DMs each UC member needs to establish all of their pairs
+    success_rate: float  # Fraction of runs that reached the target at all
+    median_minutes: float  # Median time to reach the target (inf if most runs never do)
+    p90_minutes: float  # 90th percentile time to reach the target
+    unreachable: float  # Mean fraction of online members whose UC members were all unavailable
+
+
+def _run_campaigns(rng: np.random.Generator, slots: np.ndarray, work_ahead: np.ndarray,
+                   own_cost: Optional[np.ndarray], valid: np.ndarray, online_probabilities: np.ndarray,
+                   uc_count: int, *, target: float, runs: int, uc_availability: float, dm_rate: float,
+                   response_minutes: float, established_fraction: float, new_dm_penalty: float
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Time to reach `target` and the unreachable share of online members for each run over a sample.
+
+    `work_ahead` is the expected DM cost in front of each pair, and `own_cost` is the cost of the pair
+    itself. Without `own_cost`, each pair is drawn as established with `established_fraction`.
+    """
+    sample_size, width = slots.shape
+    # Bound the working set to a few million elements per batch of runs
+    batch_size = max(1, min(runs, 4_000_000 // (sample_size * width)))
+    finish_times = []
+    unreachable = []
+
+    for start in range(0, runs, batch_size):
+        batch = min(batch_size, runs - start)
+
+        available = rng.random((batch, uc_count)) < uc_availability
+        start_times = rng.exponential(response_minutes, (batch, uc_count))
+        rates = dm_rate * rng.lognormal(0.0, 0.3, (batch, uc_count))
+        online = rng.random((batch, sample_size)) < online_probabilities[None, :]
+        if own_cost is None:
+            pair_cost = np.where(rng.random((batch, sample_size, width)) < established_fraction, 1.0,
+                                 new_dm_penalty)
+        else:
+            pair_cost = own_cost[None, :, :]
+
+        # Minutes until each UC member reaches each sampled member
+        times = start_times[:, slots] + (work_ahead[None, :, :] + pair_cost) / rates[:, slots]
+        times = np.where(available[:, slots] & valid[None, :, :], times, np.inf).min(axis=2)
+        times = np.where(online, times, np.inf)
+
+        online_count = online.sum(axis=1)
+        unreached = (online & np.isinf(times)).sum(axis=1)
+        unreachable.append(unreached / np.maximum(online_count, 1))
+
+        # Offline members sort last, so the k-th smallest time is finite only if at least k
+        # online members were reached
+        needed = np.maximum(np.ceil(target * online_count).astype(np.int64), 1)
+        times.sort(axis=1)
+        finish = np.take_along_axis(times, (needed - 1)[:, None], axis=1)[:, 0]
+        finish_times.append(np.where(online_count > 0, finish, 0.0))
+
+    return np.concatenate(finish_times), np.concatenate(unreachable)
+
+
+def _result(stripe_count: int, zen_dms_per_uc: float, finish: np.ndarray, unreachable: np.ndarray) -> SimulationResult:
+    return SimulationResult(
+        stripe_count=stripe_count,
+        zen_dms_per_uc=zen_dms_per_uc,
+        success_rate=float(np.isfinite(finish).mean()),
+        median_minutes=float(np.quantile(finish, 0.5, method="higher")),
+        p90_minutes=float(np.quantile(finish, 0.9, method="higher")),
+        unreachable=float(unreachable.mean()),
+    )
+
+
+def simulate_campaign(member_count: int, uc_count: int, stripe_counts: Sequence[int], *,
+                      target: float = 0.8, runs: int = 2000, uc_availability: float = 0.5,
+                      online_probability: float = 0.3, online_probabilities: Optional[np.ndarray] = None,
+                      dm_rate: float = 4.0, response_minutes: float = 5.0,
+                      established_fraction: float = 0.0, established_pairs: Optional[int] = None,
+                      tier_counts: Optional[np.ndarray] = None, new_dm_penalty: float = 3.0,
+                      sample_size: int = 2000, seed: Optional[int] = None) -> List[SimulationResult]:
+    """
+    Estimate how long it takes to reach `target` of the online members for each stripe count.
+
+    Every run draws which UC members show up, how quickly they start (exponential with mean
+    `response_minutes`), their DM rate (lognormal around `dm_rate` per minute) and which members
+    are online, each with their entry in `online_probabilities` or else `online_probability`. UC
+    members DM their online assigned users likeliest first, the way whipmode lists them, and a DM
+    without an established zen connection costs `new_dm_penalty` times as long. A member is reached at
+    the earliest time any of their available UC members gets to them.
+
+    Stripe tiers are given as `tier_counts`, one fixed stripe count per member or 0 for members who
+    follow the candidate stripe count, which then acts as the default.
+
+    Each stripe count is laid out the way setup would stripe it. With `established_pairs` the zen
+    connections that exist today are spread over each candidate's pairs instead of applying
+    `established_fraction` as is, since pairs a higher stripe count adds start unestablished and a
+    lower one keeps established pairs first. simulate_assignments replays the current layout instead.
+
+    Queue positions and lengths follow `_stripe_users` exactly, but only `sample_size` members are
+    tracked per run; the time spent on the members ahead of them in the queue uses its expected value,
+    which is accurate for queues of more than a few dozen users and keeps each run O(sample_size).
+    """
+    if member_count <= 0 or uc_count <= 0:
+        return []
+
+    rng = np.random.default_rng(seed)
+    sample_size = min(sample_size, member_count)
+    if online_probabilities is None:
+        online_probabilities = np.full(member_count, online_probability)
+    above, tied = presence_order(online_probabilities)
+    results = []
+
+    for stripe_count in stripe_counts:
+        stripes = min(stripe_count, uc_count)
+        counts = np.full(member_count, stripes, dtype=np.int64)
+        if tier_counts is not None:
+            # Setup shuffles members before striping, so tiered members land anywhere in the order
+            tiered = rng.permutation(np.asarray(tier_counts, dtype=np.int64))
+            counts = np.where(tiered > 0, np.minimum(tiered, uc_count), counts)
+        total_pairs = int(counts.sum())
+        if established_pairs is not None:
+            established_fraction = min(established_pairs / total_pairs, 1.0)
+        mean_cost = established_fraction + (1 - established_fraction) * new_dm_penalty
+
+        offsets = np.cumsum(counts) - counts
+        members = rng.choice(member_count, size=sample_size, replace=False)
+        slots, positions, valid = stripe_layout(offsets[members], counts[members], uc_count)
+
+        # Members likelier to be online than this one are listed first wherever they sit in the
+        # queue; tied members come first only if they were assigned earlier
+        queue_lengths = (total_pairs - np.arange(uc_count) + uc_count - 1) // uc_count
+        work_ahead = (queue_lengths[slots] * above[members][:, None]
+                      + positions * tied[members][:, None]) * mean_cost
+
+        finish, unreachable = _run_campaigns(
+            rng, slots, work_ahead, None, valid, online_probabilities[members], uc_count,
+            target=target, runs=runs, uc_availability=uc_availability, dm_rate=dm_rate,
+            response_minutes=response_minutes, established_fraction=established_fraction,
+            new_dm_penalty=new_dm_penalty,
+        )
+        results.append(_result(stripes, total_pairs / uc_count, finish, unreachable))
+
+    return results
+
+
+def simulate_assignments(queues: Sequence[np.ndarray], established: Sequence[np.ndarray],
+                         online_probabilities: np.ndarray, *, target: float = 0.8, runs: int = 2000,
+                         uc_availability: float = 0.5, dm_rate: float = 4.0, response_minutes: float = 5.0,
+                         new_dm_penalty: float = 3.0, sample_size: int = 2000,
+                         seed: Optional[int] = None) -> Optional[SimulationResult]:
+    """
+    Replay a campaign over the current assignments, with the same run model as simulate_campaign.
+
+    `queues[k]` lists indices into `online_probabilities` in the order UC member k would DM them, and
+    `established[k]` marks which of those pairs already have a zen DM, so queue lengths, positions
+    and zen progress are the real ones rather than a fresh stripe.
+    """
+    member_count = len(online_probabilities)
+    total_pairs = sum(len(queue) for queue in queues)
+    if not member_count or not total_pairs:
+        return None
+
+    rng = np.random.default_rng(seed)
+    members = rng.choice(member_count, size=min(sample_size, member_count), replace=False)
+    slots, work_ahead, own_cost, valid = queue_layout(queues, established, online_probabilities, members,
+                                                      new_dm_penalty)
+
+    finish, unreachable = _run_campaigns(
+        rng, slots, work_ahead, own_cost, valid, online_probabilities[members], len(queues),
+        target=target, runs=runs, uc_availability=uc_availability, dm_rate=dm_rate,
+        response_minutes=response_minutes, established_fraction=0.0, new_dm_penalty=new_dm_penalty,
+    )
+    return _result(0, total_pairs / len(queues), finish, unreachable)
+
+
+def format_results(results: Sequence[SimulationResult], target: float) -> str:
+    """Render simulation results as a fixed-width table, with the current assignments labelled now"""
+    lines = [f"{'Stripes':>7} {'Zen DMs/UC':>10} {'Reached':>8} {'Median':>8} {'P90':>8} {'Unreachable':>11}",
+             f"{'':>7} {'':>10} {f'{target:.0%}':>8} {'(min)':>8} {'(min)':>8} {'':>11}"]
+    for result in results:
+        stripes = result.stripe_count or "now"
+        median = "never" if math.isinf(result.median_minutes) else f"{result.median_minutes:.1f}"
+        p90 = "never" if math.isinf(result.p90_minutes) else f"{result.p90_minutes:.1f}"
+        lines.append(f"{stripes:>7} {result.zen_dms_per_uc:>10.0f} {result.success_rate:>8.0%} "
+                     f"{median:>8} {p90:>8} {result.unreachable:>11.2%}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate update campaigns for candidate stripe counts")
+    parser.add_argument("--members", type=int, required=True, help="Number of assigned members")
+    parser.add_argument("--uc", type=int, required=True, help="Number of UC members")
+    parser.add_argument("--stripes", type=int, nargs="+", default=[1, 2, 3, 4, 5, 6])
+    parser.add_argument("--target", type=float, default=0.8, help="Fraction of online members to reach")
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--uc-availability", type=float, default=0.5)
+    parser.add_argument("--online", type=float, default=0.3, help="Probability a member is online")
+    parser.add_argument("--dm-rate", type=float, default=4.0, help="DMs per minute per UC member")
+    parser.add_argument("--response", type=float, default=5.0, help="Mean minutes before a UC member starts")
+    parser.add_argument("--established", type=float, default=0.0, help="Fraction of pairs with a zen DM")
+    parser.add_argument("--established-pairs", type=int, default=None,
+                        help="Pairs with a zen DM today, overrides --established per stripe count")
+    parser.add_argument("--penalty", type=float, default=3.0, help="Cost multiplier for a new DM")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    results = simulate_campaign(
+        args.members, args.uc, args.stripes, target=args.target, runs=args.runs,
+        uc_availability=args.uc_availability, online_probability=args.online, dm_rate=args.dm_rate,
+        response_minutes=args.response, established_fraction=args.established,
+        established_pairs=args.established_pairs, new_dm_penalty=args.penalty, seed=args.seed,
+    )
+    print(format_results(results, args.target))
+
+
+if __name__ == "__main__":
+    main()
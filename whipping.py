@@ -1,17 +1,79 @@
 from redbot.core import commands, Config
 from redbot.core.bot import Red
+from redbot.core.data_manager import cog_data_path
 from redbot.core.utils.chat_formatting import pagify, box
 import discord
-from typing import Callable, Any, Dict, List, Optional, Set
+import functools
+from typing import Callable, Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import asyncio
+import calendar
+import csv
+import gzip
+import heapq
+import io
+import itertools
+import logging
 import random
+import tempfile
+import time
+from collections import Counter
 from datetime import datetime, timedelta
 import json
+import numpy as np
 
+from .journal import Journal
+from .presence import HOURS_PER_WEEK, PresenceHistograms, hour_of_week, save_snapshot
+from .query import StringKeys, TargetQuery, parse_filters
+from .simulation import simulate_assignments, simulate_campaign, format_results
 
-# Libcord server ID
+log = logging.getLogger("red.whipping")
+
+# Libcord server ID, enabled by default
 LIBCORD_GUILD_ID = 221865504766164992
 
+# Role names looked up in each guild, overridable per guild with [p]whip roles
+DEFAULT_ROLE_NAMES = {
+    "update_command": "Update Command",
+    "junior_command": "Junior Command",
+    "liberator": "Liberator",
+    "updating": "Updating",
+}
+DEFAULT_PLANNING_CHANNEL = "update-planning"
+
+# Seconds between the first unsaved change in a guild and writing it to Config
+DEFAULT_FLUSH_INTERVAL = 10
+
+# Seconds a command waits for the startup warm-up before being told to retry
+WARMUP_WAIT = 10
+
+# Activity tracking: last-activity timestamps are only rewritten once they are this many seconds old
+ACTIVITY_RESOLUTION = 3600
+IDLE_CHECK_INTERVAL = 6 * 3600
+DEFAULT_IDLE_DAYS = 30
+
+# Config keys each replayable journal operation changes
+JOURNAL_OPS = {
+    "progress": ("progress",),
+    "done": ("update_progress",),
+    "reassign": ("assignments", "progress"),
+    "join": ("assignments", "progress"),
+    "tier": ("assignments", "progress"),
+}
+
+# Seconds between samples of online members and saves of the presence histograms. Sampling well
+# within the hour means every hour a member stays online is counted
+PRESENCE_SAVE_INTERVAL = 15 * 60
+
+# Export/import settings
+EXPORT_FIELDS = ("kind", "uc_id", "user_id", "value")
+EXPORT_KINDS = ("assignment", "progress", "update")
+EXPORT_CHUNK_SIZE = 5000
+IMPORT_BATCH_SIZE = 5000
+
+# Update campaign simulator settings
+SIMULATION_MAX_RUNS = 20000
+SIMULATION_STRIPE_CANDIDATES = range(1, 7)
+
 def check_all(*predicates: Callable[[commands.Context], Any]):
     """
     Decorator that requires all provided predicates to be true.
@@ -27,88 +89,192 @@ def check_all(*predicates: Callable[[commands.Context], Any]):
     return commands.check(predicate)
 
 
-async def get_libcord_guild(ctx: commands.Context) -> Optional[discord.Guild]:
+async def get_target_guild(ctx: commands.Context) -> Optional[discord.Guild]:
     """
-    Gets the Libcord guild, works in both guild and DM contexts.
+    Gets the guild a command applies to, works in both guild and DM contexts.
     """
-    if ctx.guild and ctx.guild.id == LIBCORD_GUILD_ID:
-        return ctx.guild
-    
-    # If in DM or different guild, fetch Libcord guild
-    libcord_guild = ctx.bot.get_guild(LIBCORD_GUILD_ID)
-    return libcord_guild
+    cog = ctx.bot.get_cog("Whipping")
+    if cog is None:
+        return None
+    return await cog.resolve_guild(ctx)
 
 
 async def has_update_command_role(ctx: commands.Context) -> bool:
     """
-    Checks if the user has the update command role in Libcord.
+    Checks if the user has the update command role in the target guild.
     """
-    libcord_guild = await get_libcord_guild(ctx)
-    if libcord_guild is None:
-        return False
-    
-    # Get the member in Libcord guild
-    member = libcord_guild.get_member(ctx.author.id)
-    if member is None:
+    cog = ctx.bot.get_cog("Whipping")
+    if cog is None:
         return False
-    
-    uc_role = discord.utils.get(libcord_guild.roles, name="Update Command")
-    jc_role = discord.utils.get(libcord_guild.roles, name="Junior Command")
-    if uc_role is None:
+    if await ctx.bot.is_owner(ctx.author):
+        return True
+
+    guild = await cog.resolve_guild(ctx)
+    if guild is None:
+        # Let members of several guilds through so they can pick one with [p]whip guild
+        for candidate in await cog.candidate_guilds(ctx.author.id):
+            if await cog.is_uc_member(candidate, ctx.author.id):
+                return True
         return False
-    return (uc_role in member.roles) or (jc_role in member.roles) or (ctx.author.id == 300681028920541199)
+
+    return await cog.is_uc_member(guild, ctx.author.id)
 
 
 async def has_liberator_role(ctx: commands.Context) -> bool:
     """
-    Checks if the user has the Liberator role in Libcord.
+    Checks if the user has the Liberator role in the target guild.
     """
-    libcord_guild = await get_libcord_guild(ctx)
-    if libcord_guild is None:
+    guild = await get_target_guild(ctx)
+    if guild is None:
         return False
     
-    # Get the member in Libcord guild
-    member = libcord_guild.get_member(ctx.author.id)
+    # Get the member in the target guild
+    member = guild.get_member(ctx.author.id)
     if member is None:
         return False
     
-    liberator_role = discord.utils.get(libcord_guild.roles, name="Liberator")
+    liberator_role = await ctx.bot.get_cog("Whipping").get_role(guild, "liberator")
     return liberator_role in member.roles
 
 
 async def has_updating_role(ctx: commands.Context) -> bool:
     """
-    Checks if the user has the Updating role in Libcord.
+    Checks if the user has the Updating role in the target guild.
     """
-    libcord_guild = await get_libcord_guild(ctx)
-    if libcord_guild is None:
+    guild = await get_target_guild(ctx)
+    if guild is None:
         return False
     
-    # Get the member in Libcord guild
-    member = libcord_guild.get_member(ctx.author.id)
+    # Get the member in the target guild
+    member = guild.get_member(ctx.author.id)
     if member is None:
         return False
     
-    updating_role = discord.utils.get(libcord_guild.roles, name="Updating")
+    updating_role = await ctx.bot.get_cog("Whipping").get_role(guild, "updating")
     return updating_role in member.roles
 
 
 async def is_update_planning_channel(ctx: commands.Context) -> bool:
     """
-    Checks if the command is being used in the Update Planning channel in Libcord.
+    Checks if the command is being used in the target guild's Update Planning channel.
     """
-    libcord_guild = await get_libcord_guild(ctx)
-    if libcord_guild is None:
+    guild = await get_target_guild(ctx)
+    if guild is None:
         return False
     
     # Allow DMs to bypass this check
     if isinstance(ctx.channel, discord.DMChannel):
         return True
     
-    update_planning_channel = discord.utils.get(libcord_guild.channels, name="update-planning")
+    channel_name = await ctx.bot.get_cog("Whipping").config.guild(guild).planning_channel()
+    update_planning_channel = discord.utils.get(guild.channels, name=channel_name)
     return ctx.channel == update_planning_channel
 
 
+class GuildState:
+    """Working copy of one guild's whipping data, written back to Config on the guild's flush schedule"""
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.lock = asyncio.Lock()
+        self.loaded = False
+        self.assignments: Dict[str, List[int]] = {}  # {uc_member_id: [assigned_user_ids]}
+        self.progress: Dict[str, Dict[str, bool]] = {}  # {uc_member_id: {user_id: bool}}
+        self.update_progress: Dict[str, List[str]] = {}  # {user_id: [uc_members_who_messaged]}
+        self.activity: Dict[str, int] = {}  # {uc_member_id: last whip command, unix seconds}
+        self.idle_flagged: Set[str] = set()  # Idle UC members already announced
+        self.presence = PresenceHistograms()  # Hour-of-week activity per member, saved outside Config
+        self.journal: Optional[Journal] = None  # Every change since the last Config snapshot
+        self.snapshot_seq = 0  # Last journal record included in the data saved to Config
+        self.dirty: Set[str] = set()  # Config keys changed since the last flush
+        self.flush_task: Optional[asyncio.Task] = None
+
+        # Indexes derived from the data above
+        self.owners: Dict[int, Set[str]] = {}  # {user_id: {uc_member_ids}}
+        self.pending: Dict[str, Dict[int, None]] = {}  # {uc_member_id: ordered set of unmessaged present user_ids}
+
+    def rebuild_index(self, guild: discord.Guild):
+        """Rebuild the owner and pending-queue indexes from scratch"""
+        self.owners = {}
+        self.pending = {}
+        for uc_id, users in self.assignments.items():
+            uc_progress = self.progress.get(uc_id, {})
+            queue = self.pending[uc_id] = {}
+            for user_id in users:
+                self.owners.setdefault(user_id, set()).add(uc_id)
+                if not uc_progress.get(str(user_id), False) and guild.get_member(user_id):
+                    queue[user_id] = None
+
+    def assign(self, uc_id: str, user_id: int, present: bool = True):
+        """Assign a user to a UC member with fresh zen progress, keeping existing pairs as they are"""
+        owners = self.owners.setdefault(user_id, set())
+        if uc_id in owners:
+            return
+        owners.add(uc_id)
+        self.assignments.setdefault(uc_id, []).append(user_id)
+        self.progress.setdefault(uc_id, {})[str(user_id)] = False
+        if present:
+            self.pending.setdefault(uc_id, {})[user_id] = None
+
+    def unassign(self, uc_id: str, user_id: int):
+        """Remove a user from a UC member along with its zen progress"""
+        self.owners.get(user_id, set()).discard(uc_id)
+        if user_id in self.assignments.get(uc_id, []):
+            self.assignments[uc_id].remove(user_id)
+        self.progress.get(uc_id, {}).pop(str(user_id), None)
+        self.pending.get(uc_id, {}).pop(user_id, None)
+
+    def remove_uc(self, uc_id: str) -> List[int]:
+        """Drop a UC member with all of their assignments, returning the users they had"""
+        users = self.assignments.pop(uc_id, [])
+        for user_id in users:
+            self.owners.get(user_id, set()).discard(uc_id)
+        self.progress.pop(uc_id, None)
+        self.pending.pop(uc_id, None)
+        return users
+
+    def mark_progress(self, uc_id: str, user_id: int):
+        """Mark a user as messaged in a UC member's zen progress"""
+        self.progress.setdefault(uc_id, {})[str(user_id)] = True
+        self.pending.get(uc_id, {}).pop(user_id, None)
+
+    def mark_done(self, uc_id: str, user_id: int):
+        """Mark a user as messaged by a UC member during the current update"""
+        uc_members = self.update_progress.setdefault(str(user_id), [])
+        if uc_id not in uc_members:
+            uc_members.append(uc_id)
+
+    def member_left(self, user_id: int):
+        """Take a departed user out of every pending queue"""
+        for uc_id in self.owners.get(user_id, ()):
+            self.pending.get(uc_id, {}).pop(user_id, None)
+
+    def unassign_many(self, uc_id: str, user_ids: Set[int]):
+        """Remove several users from a UC member in a single pass over their assignment list"""
+        for user_id in user_ids:
+            self.owners.get(user_id, set()).discard(uc_id)
+            self.progress.get(uc_id, {}).pop(str(user_id), None)
+            self.pending.get(uc_id, {}).pop(user_id, None)
+        self.assignments[uc_id] = [user_id for user_id in self.assignments.get(uc_id, []) if user_id not in user_ids]
+
+    def touch(self, uc_id: str, now: int) -> bool:
+        """Record UC activity, returning whether the stored timestamp changed"""
+        if now - self.activity.get(uc_id, 0) < ACTIVITY_RESOLUTION:
+            return False
+        self.activity[uc_id] = now
+        return True
+
+    def member_returned(self, user_id: int) -> bool:
+        """Put a returning user back into the queues they weren't messaged in, if they have assignments"""
+        owners = self.owners.get(user_id)
+        if not owners:
+            return False
+        for uc_id in owners:
+            if not self.progress.get(uc_id, {}).get(str(user_id), False):
+                self.pending.setdefault(uc_id, {})[user_id] = None
+        return True
+
+
 class Whipping(commands.Cog):
     """Manages DM whipping operations for Libcord Update Command"""
 
@@ -122,15 +288,307 @@ class Whipping(commands.Cog):
             "assignments": {},  # {uc_member_id: [assigned_user_ids]}
             "progress": {},  # {uc_member_id: {user_id: bool}}
             "update_progress": {},  # {user_id: [uc_members_who_messaged]}
-            "stripe_count": 3,  # Number of UC members assigned to each user
+            "stripe_count": 3,  # Number of UC members assigned to each user without a stripe tier
+            "stripe_tiers": {},  # {role key or role name: stripe count}, highest matching tier wins
             "zen_template": "Hey! Just establishing a DM connection for future updates. You can ignore this message.",
             "whip_template": "Update incoming! Check the update channel for details.",
+            "roles": {},  # {role_key: role_name} overrides for DEFAULT_ROLE_NAMES
+            "planning_channel": DEFAULT_PLANNING_CHANNEL,
+            "flush_interval": DEFAULT_FLUSH_INTERVAL,  # Seconds before unsaved changes are written
+            "activity": {},  # {uc_member_id: last whip command, unix seconds}
+            "idle_days": DEFAULT_IDLE_DAYS,  # Days without a whip command before a UC member counts as idle
+            "hot_spare": False,  # Move idle UC members' unestablished pairs to active UC members
+            "journal_seq": 0,  # Last journal record included in the saved data
         }
 
         self.config.register_guild(**default_guild)
+        self.config.register_global(guilds=[LIBCORD_GUILD_ID])  # Guilds whipping is enabled in
+        self.config.register_user(target_guild=None)  # Guild used for the user's commands in DMs
+
+        self._states: Dict[int, GuildState] = {}
+        self._ready = asyncio.Event()  # Set once the warm-up has loaded every enabled guild
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._idle_task: Optional[asyncio.Task] = None
+        self._presence_task: Optional[asyncio.Task] = None
+
+    async def cog_load(self):
+        # Loading happens in the background so bot startup isn't held up by large guilds
+        self._warmup_task = asyncio.create_task(self._warm_up())
+        self._idle_task = asyncio.create_task(self._idle_loop())
+        self._presence_task = asyncio.create_task(self._presence_loop())
+
+    async def cog_unload(self):
+        for task in (self._warmup_task, self._idle_task, self._presence_task):
+            if task:
+                task.cancel()
+        for guild_id in list(self._states):
+            await self._unload_state(guild_id)
+
+    async def _warm_up(self):
+        """Load every enabled guild's state and indexes ahead of the first command"""
+        # Member caches have to be filled before the pending queues can be built
+        await self.bot.wait_until_red_ready()
+        start = time.perf_counter()
+        loaded = 0
+        try:
+            for guild_id in await self.config.guilds():
+                guild = self.bot.get_guild(guild_id)
+                if guild is None:
+                    continue
+                await self._get_state(guild)
+                loaded += 1
+                # Let other cogs run between guilds
+                await asyncio.sleep(0)
+        except Exception:
+            log.exception("Warm-up failed, remaining guilds will load on first use")
+        finally:
+            self._ready.set()
+
+        log.info("Warm-up loaded %d guilds in %.2f seconds", loaded, time.perf_counter() - start)
+
+    async def cog_before_invoke(self, ctx: commands.Context):
+        """Wait for the warm-up and record the activity of UC members running whip commands"""
+        if not self._ready.is_set():
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=WARMUP_WAIT)
+            except asyncio.TimeoutError:
+                raise commands.UserFeedbackCheckFailure(
+                    "⏳ Whipping is still warming up after a restart. Try again in a moment."
+                )
+
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            return
+        state = await self._get_state(guild)
+        uc_id = str(ctx.author.id)
+        if uc_id in state.assignments and state.touch(uc_id, int(time.time())):
+            self._mark_dirty(state, "activity")
+
+    async def _get_state(self, guild: discord.Guild) -> GuildState:
+        """Get a guild's working state, loading it from Config on first use"""
+        state = self._states.get(guild.id)
+        if state is None:
+            state = self._states[guild.id] = GuildState(guild.id)
+
+        if not state.loaded:
+            async with state.lock:
+                if not state.loaded:
+                    guild_config = self.config.guild(guild)
+                    state.assignments = await guild_config.assignments()
+                    state.progress = await guild_config.progress()
+                    state.update_progress = await guild_config.update_progress()
+                    state.activity = await guild_config.activity()
+                    state.presence = await asyncio.get_running_loop().run_in_executor(
+                        None, PresenceHistograms.load, self._presence_path(guild.id)
+                    )
+                    state.rebuild_index(guild)
+
+                    # Replay changes made after the last snapshot, e.g. before a crash
+                    state.snapshot_seq = await guild_config.journal_seq()
+                    state.journal = Journal(cog_data_path(self) / f"journal-{guild.id}.jsonl")
+                    tail = state.journal.open(state.snapshot_seq)
+                    for record in tail:
+                        self._apply_record(guild, state, record)
+                    if tail:
+                        log.info("Replayed %d journal records in guild %s", len(tail), guild.id)
+                        self._mark_dirty(state, "assignments", "progress", "update_progress")
+                    state.loaded = True
+
+        return state
+
+    def _apply_record(self, guild: discord.Guild, state: GuildState, record: Dict[str, Any]):
+        """Apply a journal record to the state; records of bulk operations are history only"""
+        op = record["op"]
+        if op == "progress":
+            state.mark_progress(record["uc"], record["u"])
+        elif op == "done":
+            state.mark_done(record["uc"], record["u"])
+        elif op == "reassign":
+            state.unassign(record["from_uc"], record["u"])
+            state.assign(record["to_uc"], record["u"], present=guild.get_member(record["u"]) is not None)
+        elif op == "join":
+            if not state.member_returned(record["u"]):
+                for uc_id in record["ucs"]:
+                    state.assign(uc_id, record["u"])
+        elif op == "tier":
+            for uc_id in record["drop"]:
+                state.unassign(uc_id, record["u"])
+            for uc_id in record["add"]:
+                state.assign(uc_id, record["u"], present=guild.get_member(record["u"]) is not None)
+
+    def _commit(self, guild: discord.Guild, state: GuildState, op: str, **fields: Any):
+        """Journal a change, apply it and schedule the Config write"""
+        record = state.journal.append(op, **fields)
+        self._apply_record(guild, state, record)
+        self._mark_dirty(state, *JOURNAL_OPS[op])
+
+    async def _unload_state(self, guild_id: int):
+        """Save a guild's pending changes and drop its state"""
+        state = self._states.pop(guild_id, None)
+        if state is None:
+            return
+        if state.flush_task:
+            state.flush_task.cancel()
+        await self._flush(state)
+        await self._save_presence(state)
+        if state.journal:
+            state.journal.close()
+
+    def _presence_path(self, guild_id: int):
+        return cog_data_path(self) / f"presence-{guild_id}.npz"
+
+    async def _save_presence(self, state: GuildState):
+        """Write a guild's presence histograms if they changed since the last save"""
+        if not state.presence.dirty:
+            return
+        state.presence.dirty = False
+        user_ids, counts, samples = state.presence.snapshot()
+        await asyncio.get_running_loop().run_in_executor(
+            None, save_snapshot, self._presence_path(state.guild_id), user_ids, counts, samples
+        )
 
-    def cog_unload(self):
-        pass
+    def _sample_presence(self, state: GuildState):
+        """Count every member who is online right now, so time spent online fills the histogram"""
+        guild = self.bot.get_guild(state.guild_id)
+        if guild is None or not state.loaded:
+            return
+        online = (m.id for m in guild.members if not m.bot and m.status != discord.Status.offline)
+        state.presence.sample(online)
+
+    async def _presence_loop(self):
+        while True:
+            await asyncio.sleep(PRESENCE_SAVE_INTERVAL)
+            for state in list(self._states.values()):
+                try:
+                    # Presence events only fire on changes; sampling catches members who stay online
+                    self._sample_presence(state)
+                    await self._save_presence(state)
+                except Exception:
+                    log.exception("Saving presence histograms failed in guild %s", state.guild_id)
+
+    async def _save_bulk(self, state: GuildState, op: str, **fields: Any):
+        """Journal a bulk change for history and snapshot it to Config right away"""
+        state.journal.append(op, **fields)
+        self._mark_dirty(state, "assignments", "progress", "update_progress")
+        await self._flush(state)
+
+    def _mark_dirty(self, state: GuildState, *keys: str):
+        """Record changed Config keys and schedule the guild's next flush"""
+        state.dirty.update(keys)
+        if state.flush_task is None or state.flush_task.done():
+            state.flush_task = asyncio.create_task(self._flush_later(state))
+
+    async def _flush_later(self, state: GuildState):
+        interval = await self.config.guild_from_id(state.guild_id).flush_interval()
+        await asyncio.sleep(interval)
+        await self._flush(state)
+
+    async def _flush(self, state: GuildState):
+        """Write a guild's changed keys to Config, making them the journal's new snapshot"""
+        guild_config = self.config.guild_from_id(state.guild_id)
+        # Records appended during the writes may or may not make it in; replaying them is harmless
+        seq = state.journal.seq if state.journal else 0
+        for key in list(state.dirty):
+            # Changes made while the write is in progress mark the key dirty again
+            state.dirty.discard(key)
+            try:
+                await guild_config.get_attr(key).set(getattr(state, key))
+            except BaseException:
+                state.dirty.add(key)
+                raise
+
+        if seq > state.snapshot_seq:
+            await guild_config.journal_seq.set(seq)
+            state.snapshot_seq = seq
+            state.journal.compact(seq)
+
+    async def candidate_guilds(self, user_id: int) -> List[discord.Guild]:
+        """Enabled guilds the user is a member of"""
+        guilds = [self.bot.get_guild(guild_id) for guild_id in await self.config.guilds()]
+        return [guild for guild in guilds if guild and guild.get_member(user_id)]
+
+    async def resolve_guild(self, ctx: commands.Context) -> Optional[discord.Guild]:
+        """Pick the enabled guild a command applies to, using the user's choice when several match"""
+        enabled = await self.config.guilds()
+        if ctx.guild and ctx.guild.id in enabled:
+            return ctx.guild
+
+        candidates = await self.candidate_guilds(ctx.author.id)
+        target_guild = await self.config.user(ctx.author).target_guild()
+        for guild in candidates:
+            if guild.id == target_guild:
+                return guild
+
+        if len(candidates) > 1:
+            candidates = [guild for guild in candidates if await self.is_uc_member(guild, ctx.author.id)]
+        return candidates[0] if len(candidates) == 1 else None
+
+    async def get_role(self, guild: discord.Guild, key: str) -> Optional[discord.Role]:
+        """Look up one of the DEFAULT_ROLE_NAMES roles using the guild's role mapping"""
+        role_names = {**DEFAULT_ROLE_NAMES, **await self.config.guild(guild).roles()}
+        return discord.utils.get(guild.roles, name=role_names[key])
+
+    async def is_uc_member(self, guild: discord.Guild, user_id: int) -> bool:
+        """Checks if a user has the UC or JC role in a guild"""
+        member = guild.get_member(user_id)
+        if member is None:
+            return False
+
+        uc_role = await self.get_role(guild, "update_command")
+        jc_role = await self.get_role(guild, "junior_command")
+        if uc_role is None:
+            return False
+        # The hard-coded override only applies in Libcord, not in other servers using the cog
+        is_override = user_id == 300681028920541199 and guild.id == LIBCORD_GUILD_ID
+        return (uc_role in member.roles) or (jc_role in member.roles) or is_override
+
+    async def stripe_counter(self, guild: discord.Guild,
+                             default: Optional[int] = None) -> Callable[[Optional[discord.Member]], int]:
+        """Build a lookup of how many UC members a member should be assigned to, from the stripe tiers"""
+        config = self.config.guild(guild)
+        if default is None:
+            default = await config.stripe_count()
+        tiers = []
+        for key, count in (await config.stripe_tiers()).items():
+            # Role keys such as "liberator" follow the guild's role mapping
+            role = await self.get_role(guild, key) if key in DEFAULT_ROLE_NAMES else discord.utils.get(
+                guild.roles, name=key)
+            if role:
+                tiers.append((role, count))
+
+        def stripe_count_for(member: Optional[discord.Member]) -> int:
+            if member is None:
+                return default
+            counts = [count for role, count in tiers if role in member.roles]
+            return max(counts) if counts else default
+
+        return stripe_count_for
+
+    async def _target_query(self, guild: discord.Guild, state: GuildState, uc_id: str, source: Iterable[int],
+                            filters: Optional[str]) -> TargetQuery:
+        """Build a query over a UC member's users from a filter string, raising ValueError for bad filters"""
+        query = TargetQuery(guild, source)
+        for name, argument, negated in parse_filters(filters):
+            # Index-backed filters only test IDs, so they run before any member lookup
+            if name == "done":
+                (query.exclude if negated else query.include)(StringKeys(state.update_progress))
+                continue
+            if name == "zen":
+                (query.exclude if negated else query.include)(state.pending.get(uc_id, {}))
+                continue
+
+            if name == "online":
+                predicate = lambda member: member.status != discord.Status.offline
+            elif name == "recent":
+                if not argument.isdigit():
+                    raise ValueError("filter `recent` takes a number of days, e.g. `recent:30`")
+                cutoff = discord.utils.utcnow() - timedelta(days=int(argument))
+                predicate = lambda member, cutoff=cutoff: member.joined_at is not None and member.joined_at >= cutoff
+            else:
+                role = await self.get_role(guild, name)
+                predicate = lambda member, role=role: role is not None and role in member.roles
+            query.where((lambda member, predicate=predicate: not predicate(member)) if negated else predicate)
+        return query
 
     def _safe_pagify_mentions(self, mention_list: List[str], page_length: int = 800) -> List[str]:
         """Custom pagify that ensures Discord mentions are not split across pages"""
@@ -161,28 +619,241 @@ class Whipping(commands.Cog):
 
         return pages
 
-    def _stripe_users(self, uc_members: List[int], libcord_members: List[int], stripe_count: int = 3) -> Dict[
-        int, List[int]]:
+    def _stripe_users(self, uc_members: List[int], libcord_members: List[int], stripe_count: int = 3,
+                      stripe_counts: Optional[Dict[int, int]] = None) -> Dict[int, List[int]]:
         """RAID-like striping algorithm to distribute users among UC members"""
         if not uc_members or not libcord_members:
             return {}
 
         assignments = {uc_id: [] for uc_id in uc_members}
+        stripe_counts = stripe_counts or {}
 
         # Shuffle to ensure random distribution
         shuffled_members = libcord_members.copy()
         random.shuffle(shuffled_members)
 
-        # Assign each user to multiple UC members (striping)
-        for i, user_id in enumerate(shuffled_members):
-            # Select UC members for this user
-            start_idx = (i * stripe_count) % len(uc_members)
-            for j in range(stripe_count):
+        # Assign each user to multiple UC members (striping). Each user's stripe starts where the
+        # previous one ended, so mixed stripe counts still spread evenly over the UC members
+        start_idx = 0
+        for user_id in shuffled_members:
+            user_stripes = min(stripe_counts.get(user_id, stripe_count), len(uc_members))
+            for j in range(user_stripes):
                 uc_idx = (start_idx + j) % len(uc_members)
                 assignments[uc_members[uc_idx]].append(user_id)
+            start_idx = (start_idx + user_stripes) % len(uc_members)
 
         return assignments
 
+    async def _find_idle_uc(self, guild: discord.Guild, state: GuildState) -> Tuple[List[str], List[str]]:
+        """Split UC members with assignments into idle and active ones"""
+        idle_days = await self.config.guild(guild).idle_days()
+        now = int(time.time())
+        cutoff = now - idle_days * 86400
+
+        idle, active = [], []
+        for uc_id in state.assignments:
+            # UC members who lost the role are handled by check_invalid
+            if not await self.is_uc_member(guild, int(uc_id)):
+                continue
+            if uc_id not in state.activity:
+                # Start the idle clock for UC members who haven't been tracked yet
+                state.activity[uc_id] = now
+                self._mark_dirty(state, "activity")
+            (idle if state.activity[uc_id] < cutoff else active).append(uc_id)
+
+        return idle, active
+
+    def _take_over_idle(self, guild: discord.Guild, state: GuildState, idle: List[str], active: List[str]) -> int:
+        """Move idle UC members' unestablished pairs to the least-loaded active UC members"""
+        loads = [(len(state.assignments.get(uc_id, [])), uc_id) for uc_id in active]
+        heapq.heapify(loads)
+
+        moved = 0
+        for idle_id in idle:
+            idle_progress = state.progress.get(idle_id, {})
+            moved_users = set()
+            for user_id in state.assignments.get(idle_id, []):
+                # Established pairs stay with the idle UC member
+                if idle_progress.get(str(user_id), False):
+                    continue
+
+                # Skip UC members who already have this user
+                owners = state.owners.get(user_id, set())
+                skipped = []
+                while loads and loads[0][1] in owners:
+                    skipped.append(heapq.heappop(loads))
+                if loads:
+                    load, uc_id = heapq.heappop(loads)
+                    state.assign(uc_id, user_id, present=guild.get_member(user_id) is not None)
+                    heapq.heappush(loads, (load + 1, uc_id))
+                    moved_users.add(user_id)
+                for item in skipped:
+                    heapq.heappush(loads, item)
+
+            state.unassign_many(idle_id, moved_users)
+            moved += len(moved_users)
+
+        return moved
+
+    def _plan_retier(self, guild: discord.Guild, state: GuildState,
+                     stripe_count_for: Callable[[Optional[discord.Member]], int],
+                     uc_ids: List[str]) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+        """Work out which pairs to add and drop so every present member matches their stripe tier"""
+        loads = {uc_id: len(state.assignments.get(uc_id, [])) for uc_id in uc_ids}
+        targets = {}
+        for user_id in state.owners:
+            member = guild.get_member(user_id)
+            if member is not None and not member.bot:
+                targets[user_id] = min(stripe_count_for(member), len(uc_ids))
+
+        # Drop surplus pairs first so the freed load is available when topping up
+        dropped = self._plan_drops(state, targets, loads)
+        added = self._plan_top_ups(state, targets, loads)
+        return added, dropped
+
+    def _plan_drops(self, state: GuildState, targets: Dict[int, int], loads: Dict[str, int]) -> List[Tuple[str, int]]:
+        """Pick pairs to drop for members above their target, unestablished ones and the busiest UC members first"""
+        dropped = []
+        for user_id, target in targets.items():
+            owners = state.owners.get(user_id, set())
+            if len(owners) <= target:
+                continue
+            surplus = sorted(owners, key=lambda uc_id: (state.progress.get(uc_id, {}).get(str(user_id), False),
+                                                        -loads.get(uc_id, 0)))
+            for uc_id in surplus[:len(owners) - target]:
+                dropped.append((uc_id, user_id))
+                if uc_id in loads:
+                    loads[uc_id] -= 1
+        return dropped
+
+    def _plan_top_ups(self, state: GuildState, targets: Dict[int, int],
+                      loads: Dict[str, int]) -> List[Tuple[str, int]]:
+        """Pick the least-loaded UC members in `loads` for members below their target"""
+        heap = [(load, uc_id) for uc_id, load in loads.items()]
+        heapq.heapify(heap)
+        added = []
+        for user_id, target in targets.items():
+            owners = state.owners.get(user_id, set())
+            needed = target - len(owners)
+            popped = []
+            while heap and needed > 0:
+                load, uc_id = heapq.heappop(heap)
+                if uc_id in owners:
+                    popped.append((load, uc_id))
+                    continue
+                added.append((uc_id, user_id))
+                popped.append((load + 1, uc_id))
+                needed -= 1
+            for item in popped:
+                heapq.heappush(heap, item)
+
+        return added
+
+    async def _idle_loop(self):
+        """Periodically flag idle UC members and, where enabled, hand their pairs to hot spares"""
+        await self.bot.wait_until_red_ready()
+        while True:
+            for guild_id in await self.config.guilds():
+                guild = self.bot.get_guild(guild_id)
+                if guild is None:
+                    continue
+                try:
+                    await self._run_idle_check(guild)
+                except Exception:
+                    log.exception("Idle check failed in guild %s", guild_id)
+            await asyncio.sleep(IDLE_CHECK_INTERVAL)
+
+    async def _run_idle_check(self, guild: discord.Guild):
+        state = await self._get_state(guild)
+        async with state.lock:
+            idle, active = await self._find_idle_uc(guild, state)
+            moved = 0
+            if idle and active and await self.config.guild(guild).hot_spare():
+                moved = self._take_over_idle(guild, state, idle, active)
+                if moved:
+                    await self._save_bulk(state, "takeover", idle=idle, moved=moved)
+
+        newly_idle = [uc_id for uc_id in idle if uc_id not in state.idle_flagged]
+        state.idle_flagged = set(idle)
+        if not newly_idle and not moved:
+            return
+
+        channel_name = await self.config.guild(guild).planning_channel()
+        channel = discord.utils.get(guild.text_channels, name=channel_name)
+        if channel is None:
+            return
+
+        idle_list = [f"• <@{uc_id}>" for uc_id in newly_idle]
+        message = f"💤 **{len(newly_idle)}** UC members have become idle:\n" + "\n".join(idle_list) if newly_idle else ""
+        if moved:
+            message += f"\n🔁 Moved **{moved}** unestablished pairs to active UC members."
+        for page in pagify(message):
+            await channel.send(page, allowed_mentions=discord.AllowedMentions.none())
+
+    def _iter_export_rows(self, state: GuildState) -> Iterator[Tuple[str, int, int, Any]]:
+        """Yield (kind, uc_id, user_id, value) rows for every stored assignment, zen mark and update mark"""
+        # The caller yields to the event loop between chunks, so only one UC member's list is copied at
+        # a time. That keeps memory bounded and marks made meanwhile can't break the iteration
+        for uc_id in list(state.assignments):
+            for user_id in list(state.assignments.get(uc_id, ())):
+                yield "assignment", int(uc_id), int(user_id), None
+
+        for uc_id in list(state.progress):
+            for user_id, messaged in list(state.progress.get(uc_id, {}).items()):
+                yield "progress", int(uc_id), int(user_id), bool(messaged)
+
+        for user_id in list(state.update_progress):
+            for uc_id in list(state.update_progress.get(user_id, ())):
+                yield "update", int(uc_id), int(user_id), None
+
+    def _apply_import_rows(self, guild: discord.Guild, state: GuildState,
+                           rows: List[Tuple[str, str, int, Optional[bool]]]):
+        """Merge validated import rows into a guild's data and indexes, keeping existing assignments as they are"""
+        for kind, uc_id, user_id, value in rows:
+            if kind == "assignment":
+                owners = state.owners.setdefault(user_id, set())
+                if uc_id not in owners:
+                    owners.add(uc_id)
+                    state.assignments.setdefault(uc_id, []).append(user_id)
+                    # Progress rows may come before or after the assignment they belong to
+                    if not state.progress.get(uc_id, {}).get(str(user_id), False) and guild.get_member(user_id):
+                        state.pending.setdefault(uc_id, {})[user_id] = None
+            elif kind == "progress":
+                state.progress.setdefault(uc_id, {})[str(user_id)] = value
+                if value:
+                    state.pending.get(uc_id, {}).pop(user_id, None)
+                elif uc_id in state.owners.get(user_id, ()) and guild.get_member(user_id):
+                    state.pending.setdefault(uc_id, {})[user_id] = None
+            else:
+                uc_members = state.update_progress.setdefault(str(user_id), [])
+                if uc_id not in uc_members:
+                    uc_members.append(uc_id)
+
+    def _parse_import_row(self, row: Dict[str, Any]) -> Tuple[str, int, int, Optional[bool]]:
+        """Validate a single import row, raising ValueError with a readable reason"""
+        kind = row.get("kind")
+        if kind not in EXPORT_KINDS:
+            raise ValueError(f"unknown kind {kind!r}")
+
+        try:
+            uc_id = int(row.get("uc_id"))
+            user_id = int(row.get("user_id"))
+        except (TypeError, ValueError):
+            raise ValueError("uc_id and user_id must be integer IDs")
+        if uc_id <= 0 or user_id <= 0:
+            raise ValueError("uc_id and user_id must be positive")
+
+        value = row.get("value")
+        if kind != "progress":
+            return kind, uc_id, user_id, None
+        if isinstance(value, bool):
+            return kind, uc_id, user_id, value
+        if isinstance(value, str) and value.strip().lower() in ("true", "1"):
+            return kind, uc_id, user_id, True
+        if isinstance(value, str) and value.strip().lower() in ("false", "0"):
+            return kind, uc_id, user_id, False
+        raise ValueError(f"progress value must be true or false, got {value!r}")
+
     @commands.group(name="whip")
     @commands.check(has_update_command_role)
     async def whip_group(self, ctx: commands.Context):
@@ -194,15 +865,15 @@ class Whipping(commands.Cog):
     @commands.is_owner()
     async def setup_assignments(self, ctx: commands.Context, stripe_count: int = 3):
         """Set up initial user assignments with RAID-like striping"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
         await self.config.guild(guild).stripe_count.set(stripe_count)
 
         # Get all UC members
-        uc_role = discord.utils.get(guild.roles, name="Update Command")
-        jc_role = discord.utils.get(guild.roles, name="Junior Command")
+        uc_role = await self.get_role(guild, "update_command")
+        jc_role = await self.get_role(guild, "junior_command")
         if not uc_role:
             await ctx.send("Update Command role not found!")
             return
@@ -213,118 +884,145 @@ class Whipping(commands.Cog):
         libcord_members = [m.id for m in guild.members if
                            not m.bot and uc_role not in m.roles and (not jc_role or jc_role not in m.roles)]
 
-        # Create assignments
-        assignments = self._stripe_users(uc_members, libcord_members, stripe_count)
-
-        await self.config.guild(guild).assignments.set(assignments)
+        # Create assignments, giving members in a stripe tier their tier's count
+        stripe_count_for = await self.stripe_counter(guild)
+        stripe_counts = {user_id: stripe_count_for(guild.get_member(user_id)) for user_id in libcord_members}
+        assignments = self._stripe_users(uc_members, libcord_members, stripe_count, stripe_counts)
 
         # Initialize progress tracking
         progress = {}
         for uc_id in uc_members:
             progress[str(uc_id)] = {str(user_id): False for user_id in assignments.get(uc_id, [])}
 
-        await self.config.guild(guild).progress.set(progress)
+        state = await self._get_state(guild)
+        async with state.lock:
+            state.assignments = {str(uc_id): users for uc_id, users in assignments.items()}
+            state.progress = progress
+            state.rebuild_index(guild)
+            await self._save_bulk(state, "setup", by=ctx.author.id, stripe_count=stripe_count)
 
+        tiered = sum(count != stripe_count for count in stripe_counts.values())
         await ctx.send(f"✅ Assignments created!\n"
                        f"- {len(uc_members)} UC members\n"
-                       f"- {len(libcord_members)} Libcord members\n"
-                       f"- Each user assigned to {stripe_count} UC members")
+                       f"- {len(libcord_members)} server members\n"
+                       f"- Each user assigned to {stripe_count} UC members"
+                       + (f" ({tiered} with a different stripe tier)" if tiered else ""))
 
-    @whip_group.command(name="zen")
-    @commands.check(has_update_command_role)
-    async def zen_mode(self, ctx: commands.Context, limit: Optional[int] = None):
-        """Get list of users to message for establishing DM connections"""
-        guild = await get_libcord_guild(ctx)
+    async def _send_zen_list(self, ctx: commands.Context, limit: Optional[int], silent: bool, filters: Optional[str]):
+        """Send the caller's next unmessaged users from their pending queue"""
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
         user_id = str(ctx.author.id)
 
-        assignments = await self.config.guild(guild).assignments()
-        progress = await self.config.guild(guild).progress()
+        state = await self._get_state(guild)
         zen_template = await self.config.guild(guild).zen_template()
 
-        if user_id not in assignments:
+        if user_id not in state.assignments:
             await ctx.send("You don't have any assigned users!")
             return
 
-        my_assignments = assignments[user_id]
-        my_progress = progress.get(user_id, {})
+        queue = state.pending.get(user_id, {})
+        try:
+            query = await self._target_query(guild, state, user_id, queue, filters)
+        except ValueError as e:
+            await ctx.send(f"❌ Invalid filter: {e}")
+            return
 
-        # Get unmessaged users
-        unmessaged = []
-        for assigned_id in my_assignments:
-            if not my_progress.get(str(assigned_id), False):
-                member = guild.get_member(int(assigned_id))
-                if member:
-                    unmessaged.append(member)
+        # Only the queue entries up to the `limit`-th match are looked up
+        unmessaged = query.members(limit)
+        for missing_id in query.missing:
+            queue.pop(missing_id, None)
 
         if not unmessaged:
-            await ctx.send("✅ You've already messaged all your assigned users!")
+            if filters:
+                await ctx.send("✅ None of your unmessaged users match those filters!")
+            else:
+                await ctx.send("✅ You've already messaged all your assigned users!")
             return
 
-        if limit:
-            unmessaged = unmessaged[:limit]
-
         # Create output
-        user_list = "\\n".join([f"• {member.mention} ({member.name})" for member in unmessaged])
+        user_list = "\n".join([f"• {member.mention} ({member.name})" for member in unmessaged])
 
-        embed = discord.Embed(
-            title="🧘 Zen Mode - Establish DM Connections",
-            description=f"You have **{len(unmessaged)}** users to message:",
-            color=discord.Color.blue()
-        )
+        if silent:
+            embed = discord.Embed(
+                title="🤫 Silent Zen Mode - Establish DM Connections",
+                description=f"You have **{len(unmessaged)}** users to message:\n"
+                            f"**Note:** Use @silent prefix to minimize disruption",
+                color=discord.Color.blue()
+            )
+        else:
+            embed = discord.Embed(
+                title="🧘 Zen Mode - Establish DM Connections",
+                description=f"You have **{len(unmessaged)}** users to message:",
+                color=discord.Color.blue()
+            )
 
         for page in pagify(user_list, page_length=1000):
             embed.add_field(name="Users", value=page, inline=False)
 
-        embed.add_field(name="Template", value=f"```{zen_template}```", inline=False)
+        if filters:
+            embed.add_field(name="Filters", value=f"`{filters}`", inline=False)
+        if silent:
+            # Add @silent to template
+            embed.add_field(name="Silent Template", value=f"```@silent {zen_template}```", inline=False)
+        else:
+            embed.add_field(name="Template", value=f"```{zen_template}```", inline=False)
         embed.set_footer(text="Use [p]whip progress <@user> to mark as complete")
 
         await ctx.send(embed=embed)
 
+    @whip_group.command(name="zen")
+    @commands.check(has_update_command_role)
+    async def zen_mode(self, ctx: commands.Context, limit: Optional[int] = None, *, filters: str = None):
+        """Get list of users to message for establishing DM connections"""
+        await self._send_zen_list(ctx, limit, silent=False, filters=filters)
+
     @whip_group.command(name="whipmode", aliases=["start"])
     @commands.check(has_update_command_role)
-    async def whipping_mode(self, ctx: commands.Context, online_only: bool = True):
+    async def whipping_mode(self, ctx: commands.Context, online_only: Optional[bool] = True, *, filters: str = None):
         """Start whipping mode for an update"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
         user_id = str(ctx.author.id)
 
-        assignments = await self.config.guild(guild).assignments()
+        state = await self._get_state(guild)
+        assignments = state.assignments
         whip_template = await self.config.guild(guild).whip_template()
 
         if user_id not in assignments:
             await ctx.send("You don't have any assigned users!")
             return
 
-        my_assignments = assignments[user_id]
-
-        # Get the Updating role
-        updating_role = discord.utils.get(guild.roles, name="Updating")
-
-        # Get users to message
-        to_message = []
-        for assigned_id in my_assignments:
-            member = guild.get_member(int(assigned_id))
-            if member:
-                # Skip users with the Updating role
-                if updating_role and updating_role in member.roles:
-                    continue
-                if not online_only or member.status != discord.Status.offline:
-                    to_message.append(member)
+        # A filter in place of online_only leaves it None, which keeps the online-only default.
+        # Users with the Updating role are always skipped
+        online_only = online_only is not False
+        defaults = "online -updating" if online_only else "-updating"
+        try:
+            query = await self._target_query(guild, state, user_id, assignments[user_id],
+                                             f"{defaults} {filters or ''}")
+        except ValueError as e:
+            await ctx.send(f"❌ Invalid filter: {e}")
+            return
+        to_message = query.members()
 
         if not to_message:
             await ctx.send("No users to message!")
             return
 
-        user_list = "\\n".join([f"• {member.mention} ({member.name}) - {member.status}" for member in to_message])
+        # Put the people most likely to be around at this hour of the week first
+        scores = state.presence.scores((member.id for member in to_message), hour_of_week())
+        to_message = [to_message[i] for i in np.argsort(-scores, kind="stable")]
+
+        user_list = "\n".join([f"• {member.mention} ({member.name}) - {member.status}" for member in to_message])
 
         embed = discord.Embed(
             title="⚡ Whipping Mode - Update Active",
-            description=f"{'Online only' if online_only else 'All users'}\\n"
+            description=f"{'Online only' if online_only else 'All users'}"
+                        f"{f' | Filters: `{filters}`' if filters else ''}\n"
                         f"**{len(to_message)}** users to message:",
             color=discord.Color.red()
         )
@@ -341,20 +1039,14 @@ class Whipping(commands.Cog):
     @commands.check(has_update_command_role)
     async def mark_progress(self, ctx: commands.Context, user: discord.Member):
         """Mark a user as messaged in zen mode"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
         uc_id = str(ctx.author.id)
-        user_id = str(user.id)
-
-        progress = await self.config.guild(guild).progress()
 
-        if uc_id not in progress:
-            progress[uc_id] = {}
-
-        progress[uc_id][user_id] = True
-        await self.config.guild(guild).progress.set(progress)
+        state = await self._get_state(guild)
+        self._commit(guild, state, "progress", uc=uc_id, u=user.id)
 
         await ctx.send(f"✅ Marked {user.mention} as messaged in your progress.")
 
@@ -362,22 +1054,14 @@ class Whipping(commands.Cog):
     @commands.check(has_update_command_role)
     async def mark_whip_done(self, ctx: commands.Context, user: discord.Member):
         """Mark a user as messaged during the current update"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
         uc_id = str(ctx.author.id)
-        user_id = str(user.id)
-
-        update_progress = await self.config.guild(guild).update_progress()
-
-        if user_id not in update_progress:
-            update_progress[user_id] = []
-
-        if uc_id not in update_progress[user_id]:
-            update_progress[user_id].append(uc_id)
 
-        await self.config.guild(guild).update_progress.set(update_progress)
+        state = await self._get_state(guild)
+        self._commit(guild, state, "done", uc=uc_id, u=user.id)
 
         await ctx.send(f"✅ Marked {user.mention} as messaged for the current update.")
 
@@ -385,14 +1069,15 @@ class Whipping(commands.Cog):
     @commands.check(has_update_command_role)
     async def my_stats(self, ctx: commands.Context):
         """View your assignment statistics"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
         user_id = str(ctx.author.id)
 
-        assignments = await self.config.guild(guild).assignments()
-        progress = await self.config.guild(guild).progress()
+        state = await self._get_state(guild)
+        assignments = state.assignments
+        progress = state.progress
 
         if user_id not in assignments:
             await ctx.send("You don't have any assigned users!")
@@ -420,9 +1105,9 @@ class Whipping(commands.Cog):
     @commands.is_owner()
     async def manage_templates(self, ctx: commands.Context, template_type: str = None, *, new_template: str = None):
         """View or update message templates"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
 
         if template_type is None:
@@ -453,12 +1138,13 @@ class Whipping(commands.Cog):
     @commands.check(has_update_command_role)
     async def update_report(self, ctx: commands.Context):
         """View report for the current update"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
 
-        update_progress = await self.config.guild(guild).update_progress()
+        state = await self._get_state(guild)
+        update_progress = state.update_progress
 
         if not update_progress:
             await ctx.send("No update data found!")
@@ -500,15 +1186,20 @@ class Whipping(commands.Cog):
             return
 
         guild = member.guild
-        # Only process members joining Libcord
-        if guild.id != LIBCORD_GUILD_ID:
+        # Only process members joining guilds whipping is enabled in
+        if guild.id not in await self.config.guilds():
+            return
+        # Building the indexes needs a filled member cache, so wait for the warm-up like commands do
+        await self._ready.wait()
+        state = await self._get_state(guild)
+
+        # Returning members get their previous assignments back
+        if state.member_returned(member.id):
             return
-        assignments = await self.config.guild(guild).assignments()
-        stripe_count = await self.config.guild(guild).stripe_count()
 
         # Get UC members
-        uc_role = discord.utils.get(guild.roles, name="Update Command")
-        jc_role = discord.utils.get(guild.roles, name="Junior Command")
+        uc_role = await self.get_role(guild, "update_command")
+        jc_role = await self.get_role(guild, "junior_command")
         if not uc_role:
             return
 
@@ -518,37 +1209,77 @@ class Whipping(commands.Cog):
             return
 
         # Assign new member to UC members
+        stripe_count_for = await self.stripe_counter(guild)
         random.shuffle(uc_members)
-        selected_uc = uc_members[:stripe_count]
+        selected_uc = uc_members[:stripe_count_for(member)]
 
-        for uc_id in selected_uc:
-            uc_id_str = str(uc_id)
-            if uc_id_str not in assignments:
-                assignments[uc_id_str] = []
-            if member.id not in assignments[uc_id_str]:
-                assignments[uc_id_str].append(member.id)
+        self._commit(guild, state, "join", u=member.id, ucs=[str(uc_id) for uc_id in selected_uc])
+
+    @commands.Cog.listener()
+    async def on_presence_update(self, before: discord.Member, after: discord.Member):
+        """Count members who are online towards their hour-of-week histogram"""
+        if after.bot or after.status == discord.Status.offline:
+            return
+        state = self._states.get(after.guild.id)
+        if state and state.loaded:
+            state.presence.record(after.id, hour_of_week())
 
-        await self.config.guild(guild).assignments.set(assignments)
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        """Add or drop pairs when a member gains or loses a role with a stripe tier"""
+        if after.bot or before.roles == after.roles:
+            return
 
-        # Initialize progress for new member
-        progress = await self.config.guild(guild).progress()
-        for uc_id in selected_uc:
-            uc_id_str = str(uc_id)
-            if uc_id_str not in progress:
-                progress[uc_id_str] = {}
-            progress[uc_id_str][str(member.id)] = False
+        guild = after.guild
+        if guild.id not in await self.config.guilds() or not await self.config.guild(guild).stripe_tiers():
+            return
+        await self._ready.wait()
+        state = await self._get_state(guild)
 
-        await self.config.guild(guild).progress.set(progress)
+        # Members without assignments, UC members included, are left to setup and joins
+        if not state.owners.get(after.id):
+            return
+        stripe_count_for = await self.stripe_counter(guild)
+        if stripe_count_for(before) == stripe_count_for(after):
+            return
+
+        uc_role = await self.get_role(guild, "update_command")
+        jc_role = await self.get_role(guild, "junior_command")
+        if not uc_role:
+            return
+        uc_ids = []
+        for uc_id in state.assignments:
+            member = guild.get_member(int(uc_id))
+            if member and (uc_role in member.roles or (jc_role and jc_role in member.roles)):
+                uc_ids.append(uc_id)
+        if not uc_ids:
+            return
+
+        loads = {uc_id: len(state.assignments[uc_id]) for uc_id in uc_ids}
+        targets = {after.id: min(stripe_count_for(after), len(uc_ids))}
+        dropped = self._plan_drops(state, targets, loads)
+        added = self._plan_top_ups(state, targets, loads)
+        if added or dropped:
+            self._commit(guild, state, "tier", u=after.id, add=[uc_id for uc_id, _ in added],
+                         drop=[uc_id for uc_id, _ in dropped])
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        """Take departed members out of the pending queues"""
+        state = self._states.get(member.guild.id)
+        if state and state.loaded:
+            state.member_left(member.id)
 
     @whip_group.command(name="assignments")
     @commands.check(has_update_command_role)
     async def view_assignments(self, ctx: commands.Context, member: Optional[discord.Member] = None):
         """View user assignments"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
-        assignments = await self.config.guild(guild).assignments()
+        state = await self._get_state(guild)
+        assignments = state.assignments
 
         if member:
             # View assignments for a specific UC member
@@ -599,39 +1330,23 @@ class Whipping(commands.Cog):
     async def reassign_user(self, ctx: commands.Context, user: discord.Member, from_uc: discord.Member,
                             to_uc: discord.Member):
         """Reassign a user from one UC member to another"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
-        assignments = await self.config.guild(guild).assignments()
-        progress = await self.config.guild(guild).progress()
+        state = await self._get_state(guild)
 
         from_id = str(from_uc.id)
         to_id = str(to_uc.id)
         user_id = user.id
 
         # Check if from_uc has the user
-        if from_id not in assignments or user_id not in assignments[from_id]:
+        if from_id not in state.owners.get(user_id, ()):
             await ctx.send(f"{user.mention} is not assigned to {from_uc.mention}")
             return
 
-        # Remove from old UC member
-        assignments[from_id].remove(user_id)
-        if from_id in progress and str(user_id) in progress[from_id]:
-            del progress[from_id][str(user_id)]
-
-        # Add to new UC member
-        if to_id not in assignments:
-            assignments[to_id] = []
-        if user_id not in assignments[to_id]:
-            assignments[to_id].append(user_id)
-
-        if to_id not in progress:
-            progress[to_id] = {}
-        progress[to_id][str(user_id)] = False
-
-        await self.config.guild(guild).assignments.set(assignments)
-        await self.config.guild(guild).progress.set(progress)
+        # Move to the new UC member
+        self._commit(guild, state, "reassign", u=user_id, from_uc=from_id, to_uc=to_id, by=ctx.author.id)
 
         await ctx.send(f"✅ Reassigned {user.mention} from {from_uc.mention} to {to_uc.mention}")
 
@@ -639,12 +1354,13 @@ class Whipping(commands.Cog):
     @commands.check(has_update_command_role)
     async def who_is_assigned(self, ctx: commands.Context, user: discord.Member):
         """Find which Update Command members a user is assigned to"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
-        assignments = await self.config.guild(guild).assignments()
-        progress = await self.config.guild(guild).progress()
+        state = await self._get_state(guild)
+        assignments = state.assignments
+        progress = state.progress
         
         # Find all UC members assigned to this user
         assigned_uc_members = []
@@ -688,75 +1404,25 @@ class Whipping(commands.Cog):
     
     @whip_group.command(name="zensilent")
     @commands.check(has_update_command_role)
-    async def zen_mode_silent(self, ctx: commands.Context, limit: Optional[int] = None):
+    async def zen_mode_silent(self, ctx: commands.Context, limit: Optional[int] = None, *, filters: str = None):
         """Get list of users to message with @silent prefix for minimal disruption"""
-        guild = await get_libcord_guild(ctx)
-        if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
-            return
-        user_id = str(ctx.author.id)
-
-        assignments = await self.config.guild(guild).assignments()
-        progress = await self.config.guild(guild).progress()
-        zen_template = await self.config.guild(guild).zen_template()
-
-        if user_id not in assignments:
-            await ctx.send("You don't have any assigned users!")
-            return
-
-        my_assignments = assignments[user_id]
-        my_progress = progress.get(user_id, {})
-
-        # Get unmessaged users
-        unmessaged = []
-        for assigned_id in my_assignments:
-            if not my_progress.get(str(assigned_id), False):
-                member = guild.get_member(int(assigned_id))
-                if member:
-                    unmessaged.append(member)
-
-        if not unmessaged:
-            await ctx.send("✅ You've already messaged all your assigned users!")
-            return
-
-        if limit:
-            unmessaged = unmessaged[:limit]
-
-        # Create output with @silent prefix
-        user_list = "\\n".join([f"• {member.mention} ({member.name})" for member in unmessaged])
-
-        embed = discord.Embed(
-            title="🤫 Silent Zen Mode - Establish DM Connections",
-            description=f"You have **{len(unmessaged)}** users to message:\\n"
-                        f"**Note:** Use @silent prefix to minimize disruption",
-            color=discord.Color.blue()
-        )
-
-        for page in pagify(user_list, page_length=1000):
-            embed.add_field(name="Users", value=page, inline=False)
-
-        # Add @silent to template
-        silent_template = f"@silent {zen_template}"
-        embed.add_field(name="Silent Template", value=f"```{silent_template}```", inline=False)
-        embed.set_footer(text="Use [p]whip progress <@user> to mark as complete")
-
-        await ctx.send(embed=embed)
+        await self._send_zen_list(ctx, limit, silent=True, filters=filters)
     
     @whip_group.command(name="check_invalid")
     @commands.is_owner()
     async def check_invalid_assignments(self, ctx: commands.Context, fix: bool = False):
         """Check for UC/JC members who no longer have their roles and optionally fix assignments"""
-        guild = await get_libcord_guild(ctx)
+        guild = await get_target_guild(ctx)
         if guild is None:
-            await ctx.send("❌ Cannot access Libcord server!")
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
             return
-        assignments = await self.config.guild(guild).assignments()
-        progress = await self.config.guild(guild).progress()
-        stripe_count = await self.config.guild(guild).stripe_count()
+        state = await self._get_state(guild)
+        assignments = state.assignments
+        stripe_count_for = await self.stripe_counter(guild)
         
         # Get UC and JC roles
-        uc_role = discord.utils.get(guild.roles, name="Update Command")
-        jc_role = discord.utils.get(guild.roles, name="Junior Command")
+        uc_role = await self.get_role(guild, "update_command")
+        jc_role = await self.get_role(guild, "junior_command")
         
         if not uc_role:
             await ctx.send("Update Command role not found!")
@@ -832,37 +1498,21 @@ class Whipping(commands.Cog):
         # Collect all users that need reassignment
         users_to_reassign = []
         for uc_id_str, _, _ in invalid_uc_members:
-            users_to_reassign.extend(assignments[uc_id_str])
-            # Remove invalid UC member from assignments
-            del assignments[uc_id_str]
-            # Remove from progress tracking
-            if uc_id_str in progress:
-                del progress[uc_id_str]
+            # Remove invalid UC member from assignments and progress tracking
+            users_to_reassign.extend(state.remove_uc(uc_id_str))
         
         # Remove duplicates
         users_to_reassign = list(set(users_to_reassign))
         
-        # Redistribute users using the striping algorithm
-        new_assignments = self._stripe_users(valid_uc_members, users_to_reassign, stripe_count)
-        
-        # Merge new assignments with existing ones
-        for uc_id, user_list in new_assignments.items():
-            uc_id_str = str(uc_id)
-            if uc_id_str not in assignments:
-                assignments[uc_id_str] = []
-            
-            for user_id in user_list:
-                if user_id not in assignments[uc_id_str]:
-                    assignments[uc_id_str].append(user_id)
-                    
-                    # Initialize progress for new assignment
-                    if uc_id_str not in progress:
-                        progress[uc_id_str] = {}
-                    progress[uc_id_str][str(user_id)] = False
+        # Top users back up to their stripe tier, counting the valid UC members they still have
+        loads = {str(uc_id): len(state.assignments.get(str(uc_id), [])) for uc_id in valid_uc_members}
+        targets = {user_id: min(stripe_count_for(guild.get_member(user_id)), len(valid_uc_members))
+                   for user_id in users_to_reassign}
+        for uc_id, user_id in self._plan_top_ups(state, targets, loads):
+            state.assign(uc_id, user_id, present=guild.get_member(user_id) is not None)
         
         # Save updated assignments and progress
-        await self.config.guild(guild).assignments.set(assignments)
-        await self.config.guild(guild).progress.set(progress)
+        await self._save_bulk(state, "fix", by=ctx.author.id, removed=[uc_id for uc_id, _, _ in invalid_uc_members])
         
         # Create success embed
         success_embed = discord.Embed(
@@ -890,3 +1540,617 @@ class Whipping(commands.Cog):
         )
         
         await ctx.send(embed=success_embed)
+
+    @whip_group.command(name="export")
+    @commands.is_owner()
+    async def export_data(self, ctx: commands.Context, file_format: str = "jsonl"):
+        """Export assignments, zen progress and update progress as a compressed file"""
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+
+        file_format = file_format.lower()
+        if file_format not in ("jsonl", "csv"):
+            await ctx.send("Usage: `[p]whip export [jsonl|csv]`")
+            return
+
+        state = await self._get_state(guild)
+
+        # Stream rows into a gzip-compressed temp file chunk by chunk so the export never
+        # exists as a single string in memory
+        fp = tempfile.TemporaryFile()
+        row_count = 0
+        with gzip.GzipFile(fileobj=fp, mode="wb") as gz, \
+                io.TextIOWrapper(gz, encoding="utf-8", newline="") as text:
+            writer = csv.writer(text)
+            if file_format == "csv":
+                writer.writerow(EXPORT_FIELDS)
+
+            rows = self._iter_export_rows(state)
+            while True:
+                chunk = list(itertools.islice(rows, EXPORT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                if file_format == "csv":
+                    writer.writerows(
+                        (kind, uc_id, user_id, "" if value is None else str(value).lower())
+                        for kind, uc_id, user_id, value in chunk
+                    )
+                else:
+                    text.write("".join(
+                        json.dumps(dict(zip(EXPORT_FIELDS, row)), separators=(",", ":")) + "\n"
+                        for row in chunk
+                    ))
+                row_count += len(chunk)
+                # Let other commands run between chunks
+                await asyncio.sleep(0)
+
+        size = fp.tell()
+        filesize_limit = ctx.guild.filesize_limit if ctx.guild else discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES
+        if size > filesize_limit:
+            fp.close()
+            await ctx.send(f"❌ Export is {size / 1024 / 1024:.1f} MB, above the upload limit here.")
+            return
+
+        fp.seek(0)
+        filename = f"whipping-{guild.id}-{datetime.utcnow():%Y%m%d-%H%M%S}.{file_format}.gz"
+        try:
+            await ctx.send(f"✅ Exported **{row_count}** rows ({size / 1024:.1f} KB compressed).",
+                           file=discord.File(fp, filename=filename))
+        finally:
+            fp.close()
+
+    @whip_group.command(name="import")
+    @commands.is_owner()
+    async def import_data(self, ctx: commands.Context, replace: bool = False):
+        """Import an attached export file, merging into (or replacing) the current data"""
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+
+        if not ctx.message.attachments:
+            await ctx.send("Usage: attach a `.jsonl.gz` or `.csv.gz` export to `[p]whip import [replace]`")
+            return
+        attachment = ctx.message.attachments[0]
+        is_csv = ".csv" in attachment.filename.lower()
+
+        # Stage the rows so a rejected file leaves the live data untouched
+        state = await self._get_state(guild)
+        staged = []
+        counts = {kind: 0 for kind in EXPORT_KINDS}
+        errors = []
+        error_count = 0
+
+        fp = tempfile.TemporaryFile()
+        try:
+            await attachment.save(fp)
+            fp.seek(0)
+            is_gzip = fp.read(2) == b"\x1f\x8b"
+            fp.seek(0)
+            raw = gzip.GzipFile(fileobj=fp, mode="rb") if is_gzip else fp
+            text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+            if is_csv:
+                rows = enumerate(csv.DictReader(text), start=2)
+            else:
+                rows = ((line_no, line) for line_no, line in enumerate(text, start=1) if line.strip())
+
+            while True:
+                batch = list(itertools.islice(rows, IMPORT_BATCH_SIZE))
+                if not batch:
+                    break
+
+                for line_no, row in batch:
+                    try:
+                        if not is_csv:
+                            row = json.loads(row)
+                            if not isinstance(row, dict):
+                                raise ValueError("expected a JSON object")
+                        kind, uc_id, user_id, value = self._parse_import_row(row)
+                    except ValueError as e:
+                        error_count += 1
+                        if len(errors) < 10:
+                            errors.append(f"line {line_no}: {e}")
+                        continue
+
+                    # Once the file is known to be invalid only keep validating
+                    if error_count:
+                        continue
+
+                    staged.append((kind, str(uc_id), user_id, value))
+                    counts[kind] += 1
+
+                # Let other commands run between batches
+                await asyncio.sleep(0)
+        except (OSError, EOFError, UnicodeDecodeError, csv.Error) as e:
+            await ctx.send(f"❌ Could not read {attachment.filename}: {e}")
+            return
+        finally:
+            fp.close()
+
+        if error_count:
+            await ctx.send(f"❌ Import aborted, **{error_count}** invalid rows found. Nothing was changed.\n"
+                           + box("\n".join(errors)))
+            return
+
+        # Merge into the live data at commit time, so marks made while the file was read are kept
+        async with state.lock:
+            if replace:
+                state.assignments, state.progress, state.update_progress = {}, {}, {}
+                state.owners, state.pending = {}, {}
+            for start in range(0, len(staged), IMPORT_BATCH_SIZE):
+                self._apply_import_rows(guild, state, staged[start:start + IMPORT_BATCH_SIZE])
+                # Let other commands run between batches
+                await asyncio.sleep(0)
+            await self._save_bulk(state, "import", by=ctx.author.id, replace=replace, rows=sum(counts.values()))
+
+        await ctx.send(f"✅ Import complete ({'replaced' if replace else 'merged'})!\n"
+                       f"- {counts['assignment']} assignments\n"
+                       f"- {counts['progress']} zen progress marks\n"
+                       f"- {counts['update']} update marks")
+
+    @whip_group.command(name="simulate")
+    @commands.is_owner()
+    async def simulate_update(self, ctx: commands.Context, target: float = 0.8, dm_rate: float = 4.0,
+                              runs: int = 2000, uc_availability: Optional[float] = None,
+                              update_hour: Optional[int] = None):
+        """Simulate an update campaign to compare stripe counts
+
+        Replays the current assignments and zen progress, with each member online as often as their presence
+        history says they are at `update_hour` (hour of the week in UTC, 0 = Monday 00:00, default now), then
+        compares fresh layouts for other stripe counts. `dm_rate` is DMs per minute per UC member and
+        `uc_availability` overrides the fraction of UC members expected to take part.
+        """
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+
+        if not 0 < target <= 1 or dm_rate <= 0 or not 0 < runs <= SIMULATION_MAX_RUNS:
+            await ctx.send(f"Usage: `[p]whip simulate [target 0-1] [dm_rate] [runs <= {SIMULATION_MAX_RUNS}] "
+                           f"[uc_availability] [update_hour 0-{HOURS_PER_WEEK - 1}]`")
+            return
+        if uc_availability is not None and not 0 < uc_availability <= 1:
+            await ctx.send("`uc_availability` must be between 0 and 1.")
+            return
+        if update_hour is not None and not 0 <= update_hour < HOURS_PER_WEEK:
+            await ctx.send(f"`update_hour` must be an hour of the week between 0 and {HOURS_PER_WEEK - 1}.")
+            return
+
+        state = await self._get_state(guild)
+        assignments = state.assignments
+        progress = state.progress
+        bucket = hour_of_week() if update_hour is None else update_hour
+
+        uc_members = [guild.get_member(int(uc_id)) for uc_id in assignments]
+        uc_members = [m for m in uc_members if m]
+        assigned_ids = dict.fromkeys(uid for users in assignments.values() for uid in users)
+        members = [m for m in map(guild.get_member, assigned_ids) if m]
+
+        if not uc_members or not members:
+            await ctx.send("No assignments to simulate! Run `[p]whip setup` first.")
+            return
+
+        # Presence history for the update hour; without samples for it yet, fall back to who is online now
+        online_probabilities = state.presence.online_probabilities([m.id for m in members], bucket)
+        uc_probabilities = state.presence.online_probabilities([m.id for m in uc_members], bucket)
+        if online_probabilities is None:
+            online_now = sum(1 for m in members if m.status != discord.Status.offline) / len(members)
+            online_probabilities = np.full(len(members), online_now)
+            uc_probabilities = np.array([m.status != discord.Status.offline for m in uc_members], dtype=np.float64)
+            presence_source = "members online right now (no presence samples for that hour yet)"
+        else:
+            presence_source = f"presence history for {calendar.day_abbr[bucket // 24]} {bucket % 24:02d}:00 UTC"
+        online_probabilities = np.maximum(online_probabilities, 0.01)
+        if uc_availability is None:
+            uc_availability = float(uc_probabilities.mean())
+        uc_availability = max(uc_availability, 0.01)
+
+        # The real queues, walked the way whipmode lists them at the update hour
+        index = {m.id: i for i, m in enumerate(members)}
+        queues, established = [], []
+        for uc_member in uc_members:
+            users = [uid for uid in assignments[str(uc_member.id)] if uid in index]
+            order = np.argsort(-state.presence.scores(users, bucket), kind="stable")
+            marks = progress.get(str(uc_member.id), {})
+            queues.append(np.fromiter((index[users[i]] for i in order), dtype=np.int64, count=len(users)))
+            established.append(np.fromiter((bool(marks.get(str(users[i]))) for i in order), dtype=bool,
+                                           count=len(users)))
+        total_pairs = sum(len(queue) for queue in queues)
+        established_pairs = int(sum(marks.sum() for marks in established))
+
+        # Tiered members keep their tier, the candidate stripe count applies to everyone else
+        tier_count_for = await self.stripe_counter(guild, default=0)
+        tier_counts = np.fromiter((tier_count_for(m) for m in members), dtype=np.int64, count=len(members))
+        tiered = int(np.count_nonzero(tier_counts))
+
+        loop = asyncio.get_running_loop()
+        async with ctx.typing():
+            current = await loop.run_in_executor(None, functools.partial(
+                simulate_assignments, queues, established, online_probabilities,
+                target=target, runs=runs, uc_availability=uc_availability, dm_rate=dm_rate,
+            ))
+            results = await loop.run_in_executor(None, functools.partial(
+                simulate_campaign, len(members), len(uc_members),
+                [s for s in SIMULATION_STRIPE_CANDIDATES if s <= len(uc_members)],
+                target=target, runs=runs, uc_availability=uc_availability,
+                online_probabilities=online_probabilities, dm_rate=dm_rate,
+                established_pairs=established_pairs, tier_counts=tier_counts if tiered else None,
+            ))
+        if current is not None:
+            results.insert(0, current)
+
+        stripe_count = await self.config.guild(guild).stripe_count()
+        embed = discord.Embed(
+            title="🎲 Update Campaign Simulation",
+            description=f"**{runs}** runs, time to reach **{target:.0%}** of online members\n"
+                        f"Current stripe count: **{stripe_count}**",
+            color=discord.Color.purple()
+        )
+        embed.add_field(name="Members", value=str(len(members)), inline=True)
+        embed.add_field(name="UC Members", value=str(len(uc_members)), inline=True)
+        embed.add_field(name="Zen Established", value=f"{established_pairs / max(total_pairs, 1):.0%}", inline=True)
+        embed.add_field(name="Members Online", value=f"{online_probabilities.mean():.0%}", inline=True)
+        embed.add_field(name="UC Available", value=f"{uc_availability:.0%}", inline=True)
+        embed.add_field(name="DM Rate", value=f"{dm_rate:g}/min", inline=True)
+        if tiered:
+            embed.add_field(name="Stripe Tiers",
+                            value=f"{tiered} members keep their tier's count; Stripes is the default for the rest",
+                            inline=False)
+        embed.add_field(name="Results", value=box(format_results(results, target)), inline=False)
+        embed.set_footer(text=f"\"now\" replays the current queues; other rows are fresh layouts. "
+                              f"Presence from {presence_source}")
+
+        await ctx.send(embed=embed)
+
+    @whip_group.command(name="enable")
+    @commands.is_owner()
+    @commands.guild_only()
+    async def enable_guild(self, ctx: commands.Context):
+        """Enable whipping in this server"""
+        async with self.config.guilds() as guilds:
+            if ctx.guild.id not in guilds:
+                guilds.append(ctx.guild.id)
+
+        await ctx.send(f"✅ Whipping enabled in {ctx.guild.name}. Run `[p]whip roles` to check the role mapping.")
+
+    @whip_group.command(name="disable")
+    @commands.is_owner()
+    @commands.guild_only()
+    async def disable_guild(self, ctx: commands.Context):
+        """Disable whipping in this server, keeping its data"""
+        async with self.config.guilds() as guilds:
+            if ctx.guild.id in guilds:
+                guilds.remove(ctx.guild.id)
+
+        await self._unload_state(ctx.guild.id)
+
+        await ctx.send(f"✅ Whipping disabled in {ctx.guild.name}.")
+
+    @whip_group.command(name="guild")
+    async def choose_guild(self, ctx: commands.Context, guild_id: Optional[int] = None):
+        """Choose which server your commands in DMs apply to"""
+        candidates = await self.candidate_guilds(ctx.author.id)
+
+        if guild_id is None:
+            target_guild = await self.config.user(ctx.author).target_guild()
+            guild_list = "\n".join(
+                f"{'➡️' if guild.id == target_guild else '•'} {guild.name} (`{guild.id}`)" for guild in candidates
+            )
+            await ctx.send(f"Your servers:\n{guild_list or 'None'}\n"
+                           f"Use `[p]whip guild <server_id>` to choose one.")
+            return
+
+        if guild_id not in [guild.id for guild in candidates]:
+            await ctx.send("❌ Whipping isn't enabled in that server, or you aren't a member of it.")
+            return
+
+        await self.config.user(ctx.author).target_guild.set(guild_id)
+        await ctx.send(f"✅ Commands in DMs will now apply to {self.bot.get_guild(guild_id).name}.")
+
+    @whip_group.command(name="roles")
+    @commands.is_owner()
+    async def manage_roles(self, ctx: commands.Context, role_key: str = None, *, role_name: str = None):
+        """View or update the role names used in this server"""
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+
+        if role_key is None:
+            role_names = {**DEFAULT_ROLE_NAMES, **await self.config.guild(guild).roles()}
+            embed = discord.Embed(
+                title=f"🏷️ Role Mapping for {guild.name}",
+                color=discord.Color.blue()
+            )
+            for key, name in role_names.items():
+                found = "✅" if discord.utils.get(guild.roles, name=name) else "❌"
+                embed.add_field(name=key, value=f"{found} {name}", inline=True)
+            embed.set_footer(text="✅ = Role exists | ❌ = Role not found")
+
+            await ctx.send(embed=embed)
+
+        elif role_key.lower() in DEFAULT_ROLE_NAMES and role_name:
+            async with self.config.guild(guild).roles() as roles:
+                roles[role_key.lower()] = role_name
+
+            await ctx.send(f"✅ {role_key.lower()} now uses the role `{role_name}`!")
+        else:
+            await ctx.send(f"Usage: `[p]whip roles [{'|'.join(DEFAULT_ROLE_NAMES)}] [role name]`")
+
+    @whip_group.command(name="flushinterval")
+    @commands.is_owner()
+    async def set_flush_interval(self, ctx: commands.Context, seconds: int):
+        """Set how many seconds changes are batched before they are saved"""
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+
+        if not 0 <= seconds <= 300:
+            await ctx.send("The flush interval must be between 0 and 300 seconds.")
+            return
+
+        await self.config.guild(guild).flush_interval.set(seconds)
+        await ctx.send(f"✅ Changes in {guild.name} are now saved every {seconds} seconds.")
+
+    @whip_group.command(name="planningchannel")
+    @commands.is_owner()
+    async def set_planning_channel(self, ctx: commands.Context, *, channel_name: str = None):
+        """View or set the channel used for update planning and idle announcements"""
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+
+        if channel_name is None:
+            current = await self.config.guild(guild).planning_channel()
+            await ctx.send(f"The update planning channel in {guild.name} is `#{current}`.")
+            return
+
+        channel_name = channel_name.strip().lstrip("#")
+        if not discord.utils.get(guild.text_channels, name=channel_name):
+            await ctx.send(f"❌ Channel `#{channel_name}` not found in {guild.name}!")
+            return
+
+        await self.config.guild(guild).planning_channel.set(channel_name)
+        await ctx.send(f"✅ The update planning channel in {guild.name} is now `#{channel_name}`.")
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        """Save and drop the state of guilds the bot leaves"""
+        await self._unload_state(guild.id)
+
+    @whip_group.command(name="idle")
+    @commands.is_owner()
+    async def idle_report(self, ctx: commands.Context, takeover: bool = False):
+        """List UC members who haven't used whip commands recently and optionally move their pairs"""
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+        state = await self._get_state(guild)
+        idle_days = await self.config.guild(guild).idle_days()
+
+        async with state.lock:
+            idle, active = await self._find_idle_uc(guild, state)
+
+            if not idle:
+                await ctx.send(f"✅ Every UC member has used a whip command in the last {idle_days} days.")
+                return
+
+            now = int(time.time())
+            embed = discord.Embed(
+                title="💤 Idle UC Members",
+                description=f"Found **{len(idle)}** UC members without a whip command in {idle_days} days",
+                color=discord.Color.orange()
+            )
+
+            idle_list = []
+            for uc_id in sorted(idle, key=lambda uc_id: state.activity[uc_id]):
+                uc_progress = state.progress.get(uc_id, {})
+                unestablished = sum(1 for user_id in state.assignments[uc_id]
+                                    if not uc_progress.get(str(user_id), False))
+                days = (now - state.activity[uc_id]) // 86400
+                idle_list.append(f"• <@{uc_id}>: {days} days, {unestablished} unestablished pairs")
+
+            for page in pagify("\n".join(idle_list), page_length=1000):
+                embed.add_field(name="Idle UC Members", value=page, inline=False)
+            embed.add_field(name="Active UC Members", value=str(len(active)), inline=True)
+
+            if not takeover:
+                embed.set_footer(text="Run with takeover=True to move unestablished pairs to active UC members")
+                await ctx.send(embed=embed)
+                return
+
+            if not active:
+                await ctx.send("❌ Cannot move pairs: No active UC members found!")
+                return
+
+            moved = self._take_over_idle(guild, state, idle, active)
+            await self._save_bulk(state, "takeover", by=ctx.author.id, idle=idle, moved=moved)
+
+        embed.add_field(name="Pairs Moved", value=str(moved), inline=True)
+        await ctx.send(embed=embed)
+
+    @whip_group.command(name="idleset")
+    @commands.is_owner()
+    async def idle_settings(self, ctx: commands.Context, idle_days: int, hot_spare: Optional[bool] = None):
+        """Set the idle threshold in days and whether hot spares take over automatically"""
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+
+        if idle_days < 1:
+            await ctx.send("The idle threshold must be at least 1 day.")
+            return
+
+        await self.config.guild(guild).idle_days.set(idle_days)
+        if hot_spare is not None:
+            await self.config.guild(guild).hot_spare.set(hot_spare)
+        hot_spare = await self.config.guild(guild).hot_spare()
+
+        await ctx.send(f"✅ UC members count as idle after {idle_days} days without a whip command.\n"
+                       f"Automatic hot-spare takeover is **{'on' if hot_spare else 'off'}**.")
+
+    @whip_group.command(name="history")
+    @commands.check(has_update_command_role)
+    async def mark_history(self, ctx: commands.Context, user: discord.Member, limit: int = 20):
+        """Show who marked, reassigned or assigned a user, and when"""
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+        state = await self._get_state(guild)
+
+        # Reading the archives can take a moment, keep it off the event loop
+        def search():
+            return [record for record in state.journal.history() if record.get("u") == user.id]
+
+        records = await asyncio.get_running_loop().run_in_executor(None, search)
+        if not records:
+            await ctx.send(f"No history found for {user.mention}.")
+            return
+
+        descriptions = {
+            "progress": lambda r: f"<@{r['uc']}> marked zen progress",
+            "done": lambda r: f"<@{r['uc']}> marked messaged for the update",
+            "reassign": lambda r: f"<@{r['by']}> moved from <@{r['from_uc']}> to <@{r['to_uc']}>",
+            "join": lambda r: f"Joined, assigned to {' '.join(f'<@{uc_id}>' for uc_id in r['ucs'])}",
+            "tier": lambda r: f"Stripe tier changed, added {' '.join(f'<@{uc_id}>' for uc_id in r['add']) or 'none'}, "
+                              f"dropped {' '.join(f'<@{uc_id}>' for uc_id in r['drop']) or 'none'}",
+        }
+        history = [f"<t:{record['t']}:f> {descriptions[record['op']](record)}"
+                   for record in records[-limit:] if record["op"] in descriptions]
+
+        embed = discord.Embed(
+            title=f"📜 History for {user.name}",
+            description=f"Showing the last **{len(history)}** of **{len(records)}** records",
+            color=discord.Color.blue()
+        )
+        for page in pagify("\n".join(history), page_length=1000):
+            embed.add_field(name="Records", value=page, inline=False)
+
+        await ctx.send(embed=embed)
+
+    @whip_group.command(name="tiers")
+    @commands.is_owner()
+    async def manage_tiers(self, ctx: commands.Context, role: str = None, count: int = None):
+        """View stripe tiers and the zen DMs they save, or set a role's stripe count"""
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+
+        if role is not None:
+            if count is None or not 0 <= count <= 10:
+                await ctx.send("Usage: `[p]whip tiers [role] [count]` with a count between 1 and 10, or 0 to remove the tier")
+                return
+            key = role.lower() if role.lower() in DEFAULT_ROLE_NAMES else role
+            if key not in DEFAULT_ROLE_NAMES and not discord.utils.get(guild.roles, name=key):
+                await ctx.send(f"❌ Role `{role}` not found!")
+                return
+
+            async with self.config.guild(guild).stripe_tiers() as tiers:
+                if count:
+                    tiers[key] = count
+                else:
+                    tiers.pop(key, None)
+
+            await ctx.send(f"✅ Members with `{key}` are now assigned to "
+                           f"{f'{count} UC members' if count else 'the default stripe count'}. "
+                           f"Run `[p]whip retier` to rebalance existing assignments.")
+            return
+
+        uc_role = await self.get_role(guild, "update_command")
+        jc_role = await self.get_role(guild, "junior_command")
+        if not uc_role:
+            await ctx.send("Update Command role not found!")
+            return
+
+        stripe_count = await self.config.guild(guild).stripe_count()
+        tiers = await self.config.guild(guild).stripe_tiers()
+        stripe_count_for = await self.stripe_counter(guild)
+        uc_count = sum(1 for m in guild.members if uc_role in m.roles or (jc_role and jc_role in m.roles))
+        members_per_count = Counter(
+            min(stripe_count_for(m), uc_count) for m in guild.members
+            if not m.bot and uc_role not in m.roles and (not jc_role or jc_role not in m.roles)
+        )
+
+        # Flat striping has to give everyone the top tier's redundancy
+        flat_count = min(max([stripe_count, *tiers.values()]), uc_count)
+        tiered_dms = sum(count * members for count, members in members_per_count.items())
+        flat_dms = flat_count * sum(members_per_count.values())
+        saved = flat_dms - tiered_dms
+
+        embed = discord.Embed(
+            title=f"🪜 Stripe Tiers for {guild.name}",
+            description=f"Default stripe count: **{stripe_count}** | UC members: **{uc_count}**",
+            color=discord.Color.blue()
+        )
+        tier_lines = [f"• {key}: {count}" for key, count in sorted(tiers.items(), key=lambda item: -item[1])]
+        embed.add_field(name="Tiers", value="\n".join(tier_lines) or "None", inline=False)
+        embed.add_field(
+            name="Members per Stripe Count",
+            value="\n".join(f"• {count}: {members}" for count, members in sorted(members_per_count.items())) or "None",
+            inline=False
+        )
+        embed.add_field(name="Zen DMs with Tiers", value=str(tiered_dms), inline=True)
+        embed.add_field(name=f"Flat at {flat_count}", value=str(flat_dms), inline=True)
+        embed.add_field(name="Saved", value=f"{saved} ({saved / flat_dms:.1%})" if flat_dms else "0", inline=True)
+        if uc_count:
+            embed.add_field(name="Zen DMs per UC Member", value=f"{tiered_dms / uc_count:.0f}", inline=True)
+        embed.set_footer(text="Zen DMs count every member's pairs from scratch | Use [p]whip retier to rebalance")
+
+        await ctx.send(embed=embed)
+
+    @whip_group.command(name="retier")
+    @commands.is_owner()
+    async def retier_assignments(self, ctx: commands.Context, apply: bool = False):
+        """Add or drop pairs so every member matches their stripe tier"""
+        guild = await get_target_guild(ctx)
+        if guild is None:
+            await ctx.send("❌ Cannot determine the target server! Use `[p]whip guild` to pick one.")
+            return
+
+        uc_role = await self.get_role(guild, "update_command")
+        jc_role = await self.get_role(guild, "junior_command")
+        if not uc_role:
+            await ctx.send("Update Command role not found!")
+            return
+
+        uc_ids = [str(m.id) for m in guild.members if uc_role in m.roles or (jc_role and jc_role in m.roles)]
+        if not uc_ids:
+            await ctx.send("❌ No UC/JC members found!")
+            return
+
+        state = await self._get_state(guild)
+        stripe_count_for = await self.stripe_counter(guild)
+        async with state.lock:
+            added, dropped = self._plan_retier(guild, state, stripe_count_for, uc_ids)
+            established = sum(state.progress.get(uc_id, {}).get(str(user_id), False) for uc_id, user_id in dropped)
+
+            if apply and (added or dropped):
+                dropped_by_uc = {}
+                for uc_id, user_id in dropped:
+                    dropped_by_uc.setdefault(uc_id, set()).add(user_id)
+                for uc_id, user_ids in dropped_by_uc.items():
+                    state.unassign_many(uc_id, user_ids)
+                for uc_id, user_id in added:
+                    state.assign(uc_id, user_id)
+                await self._save_bulk(state, "retier", by=ctx.author.id, added=len(added), dropped=len(dropped))
+
+        embed = discord.Embed(
+            title="✅ Assignments Retiered" if apply else "🪜 Retier Preview",
+            description=f"**{len(added)}** pairs to add, **{len(dropped)}** pairs to drop",
+            color=discord.Color.green() if apply else discord.Color.blue()
+        )
+        embed.add_field(name="New Zen DMs", value=str(len(added)), inline=True)
+        embed.add_field(name="Established Pairs Dropped", value=str(established), inline=True)
+        embed.add_field(name="Unestablished Pairs Dropped", value=str(len(dropped) - established), inline=True)
+        if not apply:
+            embed.set_footer(text="Run with apply=True to make these changes")
+
+        await ctx.send(embed=embed)